@@ -0,0 +1,53 @@
+import heapq
+
+# Alignment modes of a multi-symbol universe:
+# FORWARD_FILL - every symbol that has started gets a bar at every
+#                timestamp, repeating its last bar where it has no update.
+# UPDATED_ONLY - only the symbols with a bar at the timestamp are updated.
+FORWARD_FILL = 'ffill'
+UPDATED_ONLY = 'updated'
+
+
+class KWayMerge(object):
+    """
+    KWayMerge merges the sorted timestamp streams of many symbols into
+    one universe timeline with a heap holding the next timestamp of
+    every symbol. Each step pops the earliest timestamp together with
+    all symbols sharing it, in O(log k) per symbol update, so symbols
+    with uneven histories never need to be padded to a common index.
+
+    Streams are fed lazily: after a symbol's bar has been consumed the
+    caller pushes the symbol's following timestamp, if any.
+    """
+
+    def __init__(self, symbol_list):
+        """
+        Parameters:
+        symbol_list - A list of symbol strings; ties between symbols
+                      are returned in this order.
+        """
+        self.order = {s: i for i, s in enumerate(symbol_list)}
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, timestamp, symbol):
+        """
+        Schedules the next timestamp of a symbol.
+        """
+        heapq.heappush(self.heap, (timestamp, self.order[symbol], symbol))
+
+    def pop(self):
+        """
+        Removes the earliest timestamp from the merge and returns it
+        with the list of symbols having a bar at that timestamp, or
+        None once every stream is exhausted.
+        """
+        if not self.heap:
+            return None
+        timestamp, _, symbol = heapq.heappop(self.heap)
+        symbols = [symbol]
+        while self.heap and self.heap[0][0] == timestamp:
+            symbols.append(heapq.heappop(self.heap)[2])
+        return timestamp, symbols
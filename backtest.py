@@ -0,0 +1,157 @@
+from registry import IndicatorRegistry
+
+
+class Backtest(object):
+    """
+    Backtest wraps the event-driven main loop: it releases bars from
+    the DataHandler one at a time and lets the EventBus dispatch every
+    resulting event to the Strategy, Portfolio and ExecutionHandler
+    until the data is exhausted.
+    """
+
+    def __init__(self, data, strategy, portfolio, broker, events, profiler=None):
+        """
+        Subscribes the components to the event types they handle.
+
+        Parameters:
+        data - The DataHandler object providing the bars.
+        strategy - The Strategy object generating SignalEvents.
+        portfolio - The Portfolio object handling signals and fills.
+        broker - The ExecutionHandler object turning orders into fills.
+        events - The EventBus shared by all of the above.
+        profiler - Optional LoopProfiler timing every component call.
+        """
+        self.data = data
+        self.strategy = strategy
+        self.portfolio = portfolio
+        self.broker = broker
+        self.events = events
+        self.profiler = profiler
+
+        subscriptions = [
+            ('MARKET', 'strategy', strategy.calculate_signals),
+            ('MARKET', 'portfolio', portfolio.update_timeindex),
+            ('MARKET', 'broker', broker.update_timeindex),
+            ('SIGNAL', 'portfolio', portfolio.update_signal),
+            ('ORDER', 'broker', broker.execute_order),
+            ('FILL', 'portfolio', portfolio.update_fill),
+            ('CANCEL', 'portfolio', portfolio.update_cancel),
+        ]
+        self.update_bars = data.update_bars
+        if profiler is not None:
+            self.update_bars = profiler.wrap('data', data.update_bars)
+        for event_type, component, handler in subscriptions:
+            if profiler is not None:
+                handler = profiler.wrap(component, handler, event_type)
+            events.subscribe(event_type, handler)
+
+        self.events_dispatched = 0
+
+    def run(self):
+        """
+        Runs the backtest over the whole data set and returns the portfolio.
+        """
+        if self.profiler is not None:
+            self.profiler.start()
+
+        while self.data.continue_backtest:
+            self.update_bars()
+            self.events_dispatched += self.events.dispatch()
+
+        if self.profiler is not None:
+            self.profiler.stop()
+        return self.portfolio
+
+    async def run_async(self):
+        """
+        Runs the backtest in an asyncio loop against a DataHandler
+        providing update_bars_async() (e.g. LiveDataHandler), awaiting
+        each new bar instead of polling for it. Returns the portfolio.
+        """
+        if self.profiler is not None:
+            self.profiler.start()
+
+        while self.data.continue_backtest:
+            await self.data.update_bars_async()
+            self.events_dispatched += self.events.dispatch()
+
+        if self.profiler is not None:
+            self.profiler.stop()
+        return self.portfolio
+
+
+class Ensemble(object):
+    """
+    Ensemble runs several strategy/portfolio pairs in a single pass
+    over one DataHandler stream. The bars are loaded and released once
+    and every MarketEvent is fanned out to each pair in turn; a pair is
+    a Backtest with its own EventBus, so its signals, orders and fills
+    never reach the other pairs' portfolios and execution handlers.
+
+    Strategies of different pairs can also share their indicators
+    through self.indicators, an IndicatorRegistry over the data.
+    """
+
+    def __init__(self, data, events):
+        """
+        Parameters:
+        data - The DataHandler object providing the bars.
+        events - The EventBus the DataHandler puts its MarketEvents on.
+        """
+        self.data = data
+        self.events = events
+        self.indicators = IndicatorRegistry(data)
+        self.backtests = {}
+        self.events_dispatched = 0
+        events.subscribe('MARKET', self.fan_out)
+
+    def add(self, name, strategy, portfolio, broker, events):
+        """
+        Adds a strategy/portfolio pair and returns its Backtest.
+
+        Parameters:
+        name - The name of the pair, e.g. 'moving_average'.
+        strategy - The Strategy object, built on the shared data and events.
+        portfolio - The Portfolio object, built on the shared data and events.
+        broker - The ExecutionHandler object, built on events.
+        events - The pair's own EventBus, not the DataHandler's.
+        """
+        if events is self.events:
+            raise ValueError("Each pair needs its own EventBus")
+        if name in self.backtests:
+            raise ValueError("A pair named %s already exists" % name)
+        backtest = Backtest(self.data, strategy, portfolio, broker, events)
+        self.backtests[name] = backtest
+        return backtest
+
+    def fan_out(self, event):
+        """
+        Hands a MarketEvent to every pair, dispatching the events
+        it triggers on the pair's bus before moving to the next.
+        """
+        for backtest in self.backtests.values():
+            backtest.events.put(event)
+            backtest.events_dispatched += backtest.events.dispatch()
+
+    def run(self):
+        """
+        Runs every pair over the whole data set and returns a
+        dictionary of pair name -> portfolio.
+        """
+        while self.data.continue_backtest:
+            self.data.update_bars()
+            self.events_dispatched += self.events.dispatch()
+        return self.portfolios()
+
+    async def run_async(self):
+        """
+        Runs every pair in an asyncio loop against a DataHandler
+        providing update_bars_async(), see Backtest.run_async().
+        """
+        while self.data.continue_backtest:
+            await self.data.update_bars_async()
+            self.events_dispatched += self.events.dispatch()
+        return self.portfolios()
+
+    def portfolios(self):
+        return {name: backtest.portfolio for name, backtest in self.backtests.items()}
@@ -0,0 +1,271 @@
+import numpy as np
+import pandas as pd
+
+
+def to_datetime64(values):
+    """
+    Converts a sequence of dates/datetimes (strings, date objects or a
+    DatetimeIndex) into a NumPy datetime64 array, parsed once.
+
+    Daily data is stored at day resolution so that bars hand back
+    datetime.date objects exactly as the handlers always have;
+    intraday data keeps microsecond resolution (datetime.datetime).
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(values))
+    if len(index) == 0 or (index == index.normalize()).all():
+        return index.values.astype('datetime64[D]')
+    return index.values.astype('datetime64[us]')
+
+
+class BarStore(object):
+    """
+    BarStore holds the loaded history of every symbol in columnar form:
+    one contiguous NumPy array per field per symbol, plus a datetime64
+    array of bar times. A cursor per symbol marks how many bars have
+    been "released" to the rest of the system, so advancing through the
+    data is an integer increment rather than a DataFrame row iteration.
+    """
+
+    def __init__(self, fields):
+        """
+        Initialises an empty store.
+
+        Parameters:
+        fields - Ordered list of field names, matching the order in which
+                 they appear in the bar tuples after (symbol, datetime).
+        """
+        self.fields = list(fields)
+        self.datetimes = {}
+        self.columns = {}
+        self.cursors = {}
+
+    def add_symbol(self, symbol, datetimes, columns):
+        """
+        Adds the full history of a symbol to the store.
+
+        Parameters:
+        symbol - The ticker symbol.
+        datetimes - Sequence of bar times, converted with to_datetime64()
+                    unless already a datetime64 array.
+        columns - Dictionary of field name -> sequence of values. Contiguous
+                  arrays are used as they are, without copying.
+        """
+        if isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == 'M':
+            self.datetimes[symbol] = datetimes
+        else:
+            self.datetimes[symbol] = to_datetime64(datetimes)
+        self.columns[symbol] = {
+            f: np.ascontiguousarray(columns[f]) for f in self.fields
+        }
+        self.cursors[symbol] = 0
+
+    def length(self, symbol):
+        """
+        Returns the total number of bars loaded for the symbol.
+        """
+        return len(self.datetimes[symbol])
+
+    def dtypes(self, symbol):
+        """
+        Returns the (name, dtype) pairs of a symbol's bars, starting
+        with 'datetime', e.g. for sizing a RingBuffer.
+        """
+        columns = self.columns[symbol]
+        return [('datetime', self.datetimes[symbol].dtype)] + [
+            (f, columns[f].dtype) for f in self.fields
+        ]
+
+    def peek_datetime(self, symbol):
+        """
+        Returns the datetime of the next unreleased bar of the
+        symbol, or None if its history is exhausted.
+        """
+        cursor = self.cursors[symbol]
+        if cursor >= len(self.datetimes[symbol]):
+            return None
+        return self.datetimes[symbol][cursor]
+
+    def next_bar(self, symbol):
+        """
+        Releases the next bar of the symbol and returns it as a tuple
+        (datetime, field_1, ... field_n) of NumPy scalars, or None if
+        the history of the symbol is exhausted.
+        """
+        cursor = self.cursors[symbol]
+        if cursor >= len(self.datetimes[symbol]):
+            return None
+        self.cursors[symbol] = cursor + 1
+        columns = self.columns[symbol]
+        return (self.datetimes[symbol][cursor],) + tuple(
+            columns[f][cursor] for f in self.fields
+        )
+
+
+class RingBuffer(object):
+    """
+    RingBuffer is a fixed-capacity, columnar lookback window of the
+    latest bars of a single symbol. Appending is O(1) and memory stays
+    flat regardless of how many bars pass through it.
+
+    Every row is written twice, at position i and i + capacity, so the
+    last N rows always form one contiguous slice and windowed access
+    returns a zero-copy view instead of stitching two halves together.
+    """
+
+    def __init__(self, dtypes, capacity=1):
+        """
+        Parameters:
+        dtypes - List of (name, dtype) pairs, the first being 'datetime'.
+        capacity - The maximum number of bars retained.
+        """
+        self.names = [name for name, _ in dtypes]
+        self.capacity = max(int(capacity), 1)
+        self.columns = {
+            name: np.empty(2 * self.capacity, dtype=dtype)
+            for name, dtype in dtypes
+        }
+        self.dtypes = [(name, self.columns[name].dtype) for name in self.names]
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        """
+        Appends a bar given as a sequence of values in the order of
+        the buffer's names.
+        """
+        i = self.index
+        j = i + self.capacity
+        for name, value in zip(self.names, row):
+            column = self.columns[name]
+            column[i] = value
+            column[j] = value
+        self.index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def pad(self, datetime):
+        """
+        Appends a copy of the latest bar stamped with a new datetime,
+        i.e. forward-fills the bar. The buffer must not be empty.
+        """
+        last = self.index + self.capacity - 1
+        self.append([datetime] + [self.columns[name][last] for name in self.names[1:]])
+
+    def resize(self, capacity):
+        """
+        Changes the capacity of the buffer, keeping the most
+        recent bars that still fit.
+        """
+        capacity = max(int(capacity), 1)
+        if capacity == self.capacity:
+            return
+        n = min(self.count, capacity)
+        latest = {name: self.values(name, n).copy() for name in self.names}
+        self.capacity = capacity
+        self.columns = {
+            name: np.empty(2 * capacity, dtype=dtype)
+            for name, dtype in self.dtypes
+        }
+        for name in self.names:
+            self.columns[name][:n] = latest[name]
+            self.columns[name][capacity:capacity + n] = latest[name]
+        self.index = n % capacity
+        self.count = n
+
+    def _window(self, N):
+        end = self.index + self.capacity
+        return end - min(N, self.count), end
+
+    def values(self, name, N=1):
+        """
+        Returns a zero-copy view of the last N values of a column,
+        or fewer if less are available.
+        """
+        start, end = self._window(N)
+        return self.columns[name][start:end]
+
+    def last(self, name):
+        """
+        Returns the latest value of a column as a Python scalar, or None.
+        """
+        if self.count == 0:
+            return None
+        return self.columns[name][self.index + self.capacity - 1].item()
+
+    def tuples(self, symbol, N=1):
+        """
+        Returns the last N bars as a list of tuples
+        (symbol, datetime, field_1, ... field_n).
+        """
+        start, end = self._window(N)
+        return list(zip(
+            [symbol] * (end - start),
+            *[self.columns[name][start:end].tolist() for name in self.names]
+        ))
+
+    def array(self, N=1):
+        """
+        Returns the last N bars as a NumPy structured array.
+        """
+        start, end = self._window(N)
+        bars = np.empty(end - start, dtype=self.dtypes)
+        for name in self.names:
+            bars[name] = self.columns[name][start:end]
+        return bars
+
+
+class MatrixRingBuffer(object):
+    """
+    MatrixRingBuffer is the cross-sectional counterpart of RingBuffer: a
+    fixed-capacity time x symbol window of one field for a whole
+    universe, appended one row (the vector of every symbol's value at a
+    timestamp) at a time.
+
+    Rows are written twice like in RingBuffer, so the last N rows are
+    always a contiguous, zero-copy (N x symbols) view.
+    """
+
+    def __init__(self, width, capacity=1, dtype=np.float64):
+        """
+        Parameters:
+        width - The number of symbols (columns).
+        capacity - The maximum number of rows retained.
+        dtype - The NumPy dtype of the values.
+        """
+        self.width = width
+        self.capacity = max(int(capacity), 1)
+        self.rows = np.full((2 * self.capacity, width), np.nan, dtype=dtype)
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        """
+        Appends a row given as a vector of width values.
+        """
+        i = self.index
+        self.rows[i] = row
+        self.rows[i + self.capacity] = row
+        self.index = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def values(self, N=None):
+        """
+        Returns a zero-copy view of the last N rows (all retained rows
+        by default), oldest first, or fewer if less are available.
+        """
+        end = self.index + self.capacity
+        n = self.count if N is None else min(N, self.count)
+        return self.rows[end - n:end]
+
+    def last(self):
+        """
+        Returns a view of the latest row.
+        """
+        return self.rows[self.index + self.capacity - 1]
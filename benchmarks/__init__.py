@@ -0,0 +1,12 @@
+"""
+Reproducible throughput benchmarks of the backtester.
+
+synthetic.py generates deterministic OHLCV data, written in the CSV
+layout of HistoricCSVDataHandler or served by the in-process MySQL
+stand-in of fakemysql.py. suite.py holds the benchmarks and run.py
+runs them, saving the results as JSON and flagging regressions
+against a stored baseline:
+
+    python -m benchmarks.run --symbols 10 --bars 5000 --output new.json
+    python -m benchmarks.run --baseline old.json
+"""
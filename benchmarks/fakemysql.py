@@ -0,0 +1,110 @@
+import bisect
+import datetime
+import itertools
+import re
+
+from benchmarks.synthetic import DAILY, generate_bars
+
+_SELECT = re.compile(
+    r"SELECT (?P<columns>.+?) FROM `(?P<table>[^`]+)`"
+    r"(?: WHERE (?P<where>.+?))?(?: ORDER BY Date)?(?: LIMIT (?P<limit>\d+))?$"
+)
+
+
+class FakeMySQL(object):
+    """
+    FakeMySQL is an in-process stand-in for mysql.connector, passed to
+    HistoricMySQLDataHandler as its connector, so the MySQL code paths
+    (loaded and chunked) can be benchmarked without a server.
+
+    It serves one synthetic table per symbol with the columns Date,
+    open, high, low, close, adjClose, volume, industry and sector, and
+    answers the queries built by HistoricMySQLDataHandler._query():
+    column projection, Date bounds, ORDER BY Date, LIMIT and
+    COUNT(*), MAX(Date).
+    """
+
+    def __init__(self, symbol_list, bars, frequency=DAILY, seed=0):
+        """
+        Parameters:
+        symbol_list - A list of symbol strings, one table each.
+        bars - Number of rows per table.
+        frequency - DAILY or MINUTE, see generate_bars().
+        seed - Base seed of the synthetic data.
+        """
+        self.tables = {}
+        for s in symbol_list:
+            df = generate_bars(s, bars, frequency, seed)
+            dates = df.index.date if frequency == DAILY else df.index.to_pydatetime()
+            columns = {'Date': list(dates)}
+            columns.update({c: df[c].tolist() for c in df.columns})
+            columns['industry'] = ['Synthetic'] * bars
+            columns['sector'] = ['Benchmark'] * bars
+            self.tables[s] = columns
+
+    def connect(self, **db_config):
+        return _Connection(self.tables)
+
+
+class _Connection(object):
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def cursor(self, buffered=True):
+        return _Cursor(self.tables)
+
+    def close(self):
+        pass
+
+
+class _Cursor(object):
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows = iter(())
+
+    def execute(self, query, params=()):
+        match = _SELECT.match(query.strip())
+        if match is None:
+            raise ValueError("Unsupported query: %s" % query)
+        table = self.tables[match.group('table')]
+
+        # Select the row range within the Date bounds
+        dates = table['Date']
+        lo, hi = 0, len(dates)
+        params = list(params or ())
+        if match.group('where'):
+            for condition in match.group('where').split(' AND '):
+                value = params.pop(0)
+                # As in MySQL, a DATE compared to DATETIME values is midnight
+                if dates and isinstance(dates[0], datetime.datetime) and \
+                        not isinstance(value, datetime.datetime):
+                    value = datetime.datetime.combine(value, datetime.time())
+                if condition == 'Date >= %s':
+                    lo = max(lo, bisect.bisect_left(dates, value))
+                elif condition == 'Date > %s':
+                    lo = max(lo, bisect.bisect_right(dates, value))
+                elif condition == 'Date <= %s':
+                    hi = min(hi, bisect.bisect_right(dates, value))
+                else:
+                    raise ValueError("Unsupported condition: %s" % condition)
+
+        if match.group('limit'):
+            hi = min(hi, lo + int(match.group('limit')))
+
+        columns = match.group('columns')
+        if columns == 'COUNT(*), MAX(Date)':
+            self.rows = iter([(hi - lo, dates[hi - 1] if hi > lo else None)])
+        else:
+            names = [c.strip() for c in columns.split(',')]
+            self.rows = zip(*(table[n][lo:hi] for n in names))
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchmany(self, size=1):
+        return list(itertools.islice(self.rows, size))
+
+    def close(self):
+        pass
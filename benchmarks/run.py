@@ -0,0 +1,158 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import DAILY, MINUTE, symbol_names, write_csv_dir
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MB.
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def _run_child(name, config, repeat):
+    # Runs in a fresh process, so that the peak RSS is the benchmark's own
+    from benchmarks.suite import BENCHMARKS
+    try:
+        timings = [BENCHMARKS[name](config) for _ in range(repeat)]
+    except Exception as e:
+        traceback.print_exc()
+        return {'error': '%s: %s' % (type(e).__name__, e)}
+    best = min(timings, key=lambda timing: timing[1])
+    bars, seconds = best[:2]
+    result = {
+        'bars': bars,
+        'seconds': seconds,
+        'bars_per_sec': bars / seconds if seconds > 0 else float('inf'),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    # Further metrics reported by the benchmark, e.g. latencies
+    if len(best) > 2:
+        result.update(best[2])
+    return result
+
+
+def run_benchmark(name, config, repeat=3):
+    """
+    Runs a benchmark repeat times in a spawned process and returns its
+    result: bars, best seconds, bars_per_sec and peak_rss_mb, or error.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_child, name, config, repeat).result()
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Compares a report with a baseline report. Returns the printable
+    comparison lines and the names of the benchmarks whose bars/sec
+    dropped by more than tolerance (a fraction, e.g. 0.1 for 10%).
+    """
+    lines, regressions = [], []
+    if report['config'] != baseline['config']:
+        lines.append("warning: the baseline was run with a different configuration %s"
+                     % baseline['config'])
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            continue
+        change = result['bars_per_sec'] / base['bars_per_sec'] - 1.0
+        rss_change = result['peak_rss_mb'] - base['peak_rss_mb']
+        flag = ''
+        if change < -tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        lines.append("%-34s %+7.1f%% bars/sec %+8.1f MB peak RSS%s"
+                     % (name, 100.0 * change, rss_change, flag))
+    return lines, regressions
+
+
+def main(argv=None):
+    from benchmarks.suite import BENCHMARKS
+
+    parser = argparse.ArgumentParser(description="Runs the backtester benchmarks.")
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--bars', type=int, default=2000, help="bars per symbol")
+    parser.add_argument('--frequency', choices=[DAILY, MINUTE], default=DAILY)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--live-rate', type=float, default=5000,
+                        help="messages per second of the live_replay feed")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark, the best is kept")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--output', default='benchmark.json', help="JSON file of the results")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="bars/sec drop flagged as a regression, default 0.1 (10%%)")
+    args = parser.parse_args(argv)
+
+    config = {
+        'symbols': args.symbols,
+        'bars': args.bars,
+        'frequency': args.frequency,
+        'seed': args.seed,
+        'live_rate': args.live_rate,
+    }
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'config': config,
+        'environment': environment(),
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory() as csv_dir:
+        write_csv_dir(csv_dir, symbol_names(args.symbols), args.bars, args.frequency, args.seed)
+        for name in args.only or BENCHMARKS:
+            result = run_benchmark(name, dict(config, csv_dir=csv_dir), args.repeat)
+            report['results'][name] = result
+            if 'error' in result:
+                print("%-34s failed: %s" % (name, result['error']))
+            else:
+                print("%-34s %12.0f bars/sec %8.3f s %8.1f MB peak RSS"
+                      % (name, result['bars_per_sec'], result['seconds'], result['peak_rss_mb']))
+                for key, value in result.items():
+                    if key not in ('bars', 'seconds', 'bars_per_sec', 'peak_rss_mb'):
+                        print("    %-30s %12.1f" % (key, value))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(report, baseline, args.tolerance)
+        print()
+        print("\n".join(lines))
+        if regressions:
+            print("\n%d regression(s): %s" % (len(regressions), ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
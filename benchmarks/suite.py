@@ -0,0 +1,302 @@
+import asyncio
+import contextlib
+import datetime
+import os
+import random
+import threading
+import time
+
+from backtest import Backtest, Ensemble
+from bus import EventBus
+from bars import BarStore
+from data import HistoricArrayDataHandler, HistoricCSVDataHandler, HistoricMySQLDataHandler
+from event import OrderEvent
+from execution import OrderBookExecutionHandler, SimulatedExecutionHandler, VolumeParticipation
+from live import LatencyMonitor, LiveDataHandler, ReplayServer
+from momentum import MomentumRankStrategy
+from portfolio import NaivePortfolio
+from simple import MovingAverageCrossoverStrategy
+from stopLoss import StopLossStrategy
+
+from benchmarks.fakemysql import FakeMySQL
+from benchmarks.synthetic import generate_bars, symbol_names
+
+# Every benchmark takes the run configuration (symbols, bars, frequency,
+# seed, live_rate and csv_dir) and returns the number of bars processed
+# and the seconds spent in the measured component, optionally followed
+# by a dictionary of further metrics.
+BENCHMARKS = {}
+
+# Strategies benchmarked by calculate_signals, built from (data, events, portfolio)
+STRATEGIES = {
+    'moving_average_crossover': lambda data, events, portfolio:
+        MovingAverageCrossoverStrategy(data, events),
+    'stop_loss': lambda data, events, portfolio:
+        StopLossStrategy(data, events, 44, portfolio),
+    'momentum_rank': lambda data, events, portfolio:
+        MomentumRankStrategy(data, events),
+}
+
+START_DATE = datetime.date(2000, 1, 1)
+
+# Orders sent per timestamp by the order_book benchmark
+ORDERS_PER_BAR = 100
+
+# Smallest universe, and most bars per symbol, of the universe_momentum_rank benchmark
+UNIVERSE_SYMBOLS = 1000
+UNIVERSE_BARS = 500
+
+
+def benchmark(name):
+    """
+    Registers a benchmark function under name.
+    """
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def _symbols(config):
+    return symbol_names(config['symbols'])
+
+
+def _total_bars(config):
+    return config['symbols'] * config['bars']
+
+
+def _csv_handler(config, events, **kwargs):
+    return HistoricCSVDataHandler(events, config['csv_dir'], _symbols(config), **kwargs)
+
+
+def _timed(handler, elapsed):
+    """
+    Wraps an event handler, accumulating its run time into elapsed[0].
+    """
+    def timed(event):
+        start = time.perf_counter()
+        handler(event)
+        elapsed[0] += time.perf_counter() - start
+    return timed
+
+
+@benchmark('load_csv')
+def load_csv(config):
+    start = time.perf_counter()
+    _csv_handler(config, EventBus())
+    return _total_bars(config), time.perf_counter() - start
+
+
+@benchmark('load_mysql')
+def load_mysql(config):
+    connector = FakeMySQL(_symbols(config), config['bars'], config['frequency'], config['seed'])
+    start = time.perf_counter()
+    HistoricMySQLDataHandler(EventBus(), {}, _symbols(config), connector=connector)
+    return _total_bars(config), time.perf_counter() - start
+
+
+@benchmark('stream_mysql')
+def stream_mysql(config):
+    connector = FakeMySQL(_symbols(config), config['bars'], config['frequency'], config['seed'])
+    events = EventBus()
+    start = time.perf_counter()
+    data = HistoricMySQLDataHandler(
+        events, {}, _symbols(config), connector=connector, chunk_size=10000
+    )
+    while data.continue_backtest:
+        data.update_bars()
+        events.dispatch()
+    return _total_bars(config), time.perf_counter() - start
+
+
+@benchmark('update_bars')
+def update_bars(config):
+    events = EventBus()
+    data = _csv_handler(config, events)
+    start = time.perf_counter()
+    while data.continue_backtest:
+        data.update_bars()
+        events.dispatch()
+    return _total_bars(config), time.perf_counter() - start
+
+
+def _strategy_benchmark(strategy_name):
+    def run(config):
+        events = EventBus()
+        data = _csv_handler(config, events)
+        portfolio = NaivePortfolio(data, events, START_DATE, _symbols(config))
+        # Strategies such as StopLossStrategy print on every bar
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            strategy = STRATEGIES[strategy_name](data, events, portfolio)
+            elapsed = [0.0]
+            events.subscribe('MARKET', _timed(strategy.calculate_signals, elapsed))
+            while data.continue_backtest:
+                data.update_bars()
+                events.dispatch()
+        return _total_bars(config), elapsed[0]
+    return run
+
+for _name in STRATEGIES:
+    benchmark('signals_%s' % _name)(_strategy_benchmark(_name))
+
+
+@benchmark('portfolio')
+def portfolio_updates(config):
+    events = EventBus()
+    data = _csv_handler(config, events)
+    portfolio = NaivePortfolio(data, events, START_DATE, _symbols(config))
+    strategy = MovingAverageCrossoverStrategy(data, events)
+    broker = SimulatedExecutionHandler(events)
+
+    elapsed = [0.0]
+    events.subscribe('MARKET', strategy.calculate_signals)
+    events.subscribe('MARKET', _timed(portfolio.update_timeindex, elapsed))
+    events.subscribe('SIGNAL', _timed(portfolio.update_signal, elapsed))
+    events.subscribe('ORDER', broker.execute_order)
+    events.subscribe('FILL', _timed(portfolio.update_fill, elapsed))
+    while data.continue_backtest:
+        data.update_bars()
+        events.dispatch()
+    return _total_bars(config), elapsed[0]
+
+
+@benchmark('universe_momentum_rank')
+def universe_momentum_rank(config):
+    # The cross-sectional strategy over a large universe, generated in memory
+    symbols = symbol_names(max(config['symbols'], UNIVERSE_SYMBOLS))
+    bars = min(config['bars'], UNIVERSE_BARS)
+    store = BarStore(HistoricCSVDataHandler.fields)
+    for s in symbols:
+        df = generate_bars(s, bars, config['frequency'], config['seed'])
+        store.add_symbol(s, df.index.to_numpy(), {f: df[f].to_numpy() for f in store.fields})
+
+    events = EventBus()
+    data = HistoricArrayDataHandler(events, store, symbols)
+    strategy = MomentumRankStrategy(data, events)
+    elapsed = [0.0]
+    events.subscribe('MARKET', _timed(strategy.calculate_signals, elapsed))
+    while data.continue_backtest:
+        data.update_bars()
+        events.dispatch()
+    return len(symbols) * bars, elapsed[0], {'us_per_timestamp': 1e6 * elapsed[0] / bars}
+
+
+@benchmark('order_book')
+def order_book(config):
+    # Random limit, stop, market and cancel orders around the latest
+    # close, ORDERS_PER_BAR per timestamp, worked by the order book broker
+    events = EventBus()
+    data = _csv_handler(config, events)
+    broker = OrderBookExecutionHandler(events, data, VolumeParticipation(0.1))
+    symbols = _symbols(config)
+    rng = random.Random(config['seed'])
+
+    elapsed = [0.0]
+    events.subscribe('MARKET', _timed(broker.update_timeindex, elapsed))
+    events.subscribe('ORDER', _timed(broker.execute_order, elapsed))
+    working = []
+    operations = 0
+    while data.continue_backtest:
+        data.update_bars()
+        for _ in range(ORDERS_PER_BAR):
+            symbol = rng.choice(symbols)
+            draw = rng.random()
+            if draw < 0.3 and working:
+                order = working.pop(rng.randrange(len(working)))
+                events.put(OrderEvent(order.symbol, 'CXL', 0, None, order_id=order.sequence))
+            else:
+                close = data.get_latest_bar_value(symbol, 'close')
+                direction = 'BUY' if rng.random() < 0.5 else 'SELL'
+                offset = rng.uniform(0.0, 0.05) * (-1 if direction == 'BUY' else 1)
+                if draw < 0.85:
+                    order = OrderEvent(symbol, 'LMT', rng.randint(1, 500), direction,
+                                       round(close * (1 + offset), 2))
+                elif draw < 0.95:
+                    order = OrderEvent(symbol, 'STP', rng.randint(1, 500), direction,
+                                       round(close * (1 - offset), 2))
+                else:
+                    order = OrderEvent(symbol, 'MKT', rng.randint(1, 500), direction)
+                working.append(order)
+                events.put(order)
+            operations += 1
+        events.dispatch()
+    return _total_bars(config), elapsed[0], {'order_ops_per_sec': operations / elapsed[0]}
+
+
+@benchmark('loop')
+def loop(config):
+    # The components of loop.py, reading from the MySQL stand-in
+    connector = FakeMySQL(_symbols(config), config['bars'], config['frequency'], config['seed'])
+    start = time.perf_counter()
+    events = EventBus()
+    data = HistoricMySQLDataHandler(events, {}, _symbols(config), connector=connector)
+    portfolio = NaivePortfolio(data, events, START_DATE, _symbols(config))
+    strategy = MovingAverageCrossoverStrategy(data, events)
+    broker = SimulatedExecutionHandler(events)
+    Backtest(data, strategy, portfolio, broker, events).run()
+    portfolio.output_summary_stats(filename=None)
+    return _total_bars(config), time.perf_counter() - start
+
+
+@benchmark('ensemble')
+def ensemble(config):
+    # Every strategy of STRATEGIES with its own portfolio and broker in
+    # one pass over the CSV data, against one full run per strategy
+    def build(name, data, events):
+        portfolio = NaivePortfolio(data, events, START_DATE, _symbols(config))
+        strategy = STRATEGIES[name](data, events, portfolio)
+        return strategy, portfolio, SimulatedExecutionHandler(events)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for name in STRATEGIES:
+            events = EventBus()
+            data = _csv_handler(config, events)
+            Backtest(data, *build(name, data, events), events).run()
+        separate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        events = EventBus()
+        data = _csv_handler(config, events)
+        runs = Ensemble(data, events)
+        for name in STRATEGIES:
+            pair_events = EventBus()
+            runs.add(name, *build(name, data, pair_events), pair_events)
+        runs.run()
+        elapsed = time.perf_counter() - start
+    return _total_bars(config) * len(STRATEGIES), elapsed, {'separate_runs_seconds': separate}
+
+
+@benchmark('live_replay')
+def live_replay(config):
+    # The replay server runs its own asyncio loop in a thread, so that
+    # sending is not paced by the consumer's loop
+    server = ReplayServer.from_handler(_csv_handler(config, EventBus()), config['live_rate'])
+    server_loop = asyncio.new_event_loop()
+    server_loop.run_until_complete(server.start())
+    thread = threading.Thread(target=server_loop.run_forever, daemon=True)
+    thread.start()
+
+    events = EventBus()
+    data = LiveDataHandler(events, server.host, server.port, _symbols(config))
+    portfolio = NaivePortfolio(data, events, START_DATE, _symbols(config))
+    strategy = MovingAverageCrossoverStrategy(data, events)
+    broker = SimulatedExecutionHandler(events)
+    backtest = Backtest(data, strategy, portfolio, broker, events)
+    monitor = LatencyMonitor(data, events)
+
+    start = time.perf_counter()
+    asyncio.run(backtest.run_async())
+    elapsed = time.perf_counter() - start
+
+    asyncio.run_coroutine_threadsafe(server.close(), server_loop).result()
+    server_loop.call_soon_threadsafe(server_loop.stop)
+    thread.join()
+
+    latency = monitor.summary()
+    metrics = {'messages_per_sec': config['bars'] / elapsed}
+    for name in ('market', 'signal'):
+        for key in ('p50_us', 'p99_us', 'max_us'):
+            if key in latency[name]:
+                metrics['%s_latency_%s' % (name, key)] = latency[name][key]
+    return _total_bars(config), elapsed, metrics
@@ -0,0 +1,87 @@
+import os, os.path
+import zlib
+
+import numpy as np
+import pandas as pd
+
+DAILY = 'daily'
+MINUTE = 'minute'
+
+# Minute bars of a regular session, 09:30 to 15:59
+SESSION_MINUTES = 390
+
+
+def symbol_names(count):
+    """
+    Returns count synthetic ticker symbols, 'SYM0000', 'SYM0001', ...
+    """
+    return ['SYM%04d' % i for i in range(count)]
+
+
+def bar_index(bars, frequency=DAILY, start='2000-01-03'):
+    """
+    Returns the DatetimeIndex of bars business-day (DAILY) or
+    intraday session minute (MINUTE) timestamps from start.
+    """
+    if frequency == DAILY:
+        return pd.bdate_range(start, periods=bars)
+    if frequency == MINUTE:
+        days = pd.bdate_range(start, periods=-(-bars // SESSION_MINUTES))
+        minutes = pd.to_timedelta(np.arange(SESSION_MINUTES), unit='min') + pd.Timedelta('09:30:00')
+        index = (days.values[:, None] + minutes.values[None, :]).ravel()[:bars]
+        return pd.DatetimeIndex(index)
+    raise ValueError("Unknown frequency: %s" % frequency)
+
+
+def generate_bars(symbol, bars, frequency=DAILY, seed=0, start='2000-01-03'):
+    """
+    Generates a deterministic OHLCV history for a symbol: closes follow
+    a geometric random walk, opens gap from the previous close and the
+    high/low range brackets both. The same (symbol, bars, frequency,
+    seed) always gives the same bars.
+
+    Returns a DataFrame indexed on the bar timestamps with the columns
+    open, high, low, close, adjClose and volume.
+
+    Parameters:
+    symbol - The ticker symbol, which also seeds its price path.
+    bars - Number of bars to generate.
+    frequency - DAILY or MINUTE.
+    seed - Base seed of the random generator.
+    start - The first trading day.
+    """
+    index = bar_index(bars, frequency, start)
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode('utf-8'))])
+    vol = 0.02 if frequency == DAILY else 0.001
+
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, vol, bars)))
+    previous = np.concatenate(([100.0], close[:-1]))
+    open_ = previous * (1.0 + rng.normal(0.0, vol / 4, bars))
+    high = np.maximum(open_, close) * (1.0 + np.abs(rng.normal(0.0, vol / 2, bars)))
+    low = np.minimum(open_, close) * (1.0 - np.abs(rng.normal(0.0, vol / 2, bars)))
+    volume = rng.integers(1000, 100000, bars)
+
+    return pd.DataFrame({
+        'open': open_.round(4),
+        'high': high.round(4),
+        'low': low.round(4),
+        'close': close.round(4),
+        'adjClose': close.round(4),
+        'volume': volume,
+    }, index=index)
+
+
+def write_csv_dir(csv_dir, symbol_list, bars, frequency=DAILY, seed=0):
+    """
+    Writes one 'symbol.csv' file per symbol into csv_dir, in the
+    Date,Open,High,Low,Close,Adj Close,Volume layout read by
+    HistoricCSVDataHandler. Returns the total number of bars written.
+    """
+    os.makedirs(csv_dir, exist_ok=True)
+    date_format = '%Y-%m-%d' if frequency == DAILY else '%Y-%m-%d %H:%M:%S'
+    for s in symbol_list:
+        df = generate_bars(s, bars, frequency, seed)
+        df.index.name = 'Date'
+        df.columns = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+        df.to_csv(os.path.join(csv_dir, '%s.csv' % s), date_format=date_format)
+    return bars * len(symbol_list)
@@ -0,0 +1,92 @@
+import queue
+
+from collections import deque
+
+
+class EventBus(object):
+    """
+    EventBus is the event queue shared by all components, combined
+    with a registry of handlers keyed on the event type ('MARKET',
+    'SIGNAL', 'ORDER', 'FILL', 'CANCEL'). Components put events on the bus as
+    they would on a queue; dispatch() drains it and hands every event
+    to the handlers subscribed to its type, in subscription order.
+
+    A backtest runs in a single thread, so by default the events are
+    held in a collections.deque with no locking. Live trading, where
+    events may be put from other threads, uses threadsafe=True, which
+    falls back to a queue.Queue.
+    """
+
+    def __init__(self, threadsafe=False):
+        """
+        Parameters:
+        threadsafe - Use a locking queue.Queue instead of a deque.
+        """
+        self.threadsafe = threadsafe
+        self.handlers = {}
+        if threadsafe:
+            self._events = queue.Queue()
+            self.put = self._events.put
+        else:
+            self._events = deque()
+            self.put = self._events.append
+
+    def subscribe(self, event_type, handler):
+        """
+        Registers a callable invoked with every event of event_type.
+        """
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        """
+        Removes a handler registered with subscribe().
+        """
+        self.handlers[event_type].remove(handler)
+
+    def empty(self):
+        """
+        Returns True if no events are pending.
+        """
+        if self.threadsafe:
+            return self._events.empty()
+        return not self._events
+
+    def get(self, block=False):
+        """
+        Removes and returns the next pending event, raising queue.Empty
+        if there is none, as queue.Queue.get(block=False) does.
+        """
+        if self.threadsafe:
+            return self._events.get(block=block)
+        try:
+            return self._events.popleft()
+        except IndexError:
+            raise queue.Empty
+
+    def dispatch(self):
+        """
+        Hands every pending event, including those put by the handlers
+        themselves, to the handlers of its type until the bus is empty.
+        Returns the number of events dispatched.
+        """
+        handlers = self.handlers
+        count = 0
+        if self.threadsafe:
+            while True:
+                try:
+                    event = self._events.get(block=False)
+                except queue.Empty:
+                    break
+                if event is not None:
+                    count += 1
+                    for handler in handlers.get(event.type, ()):
+                        handler(event)
+        else:
+            events = self._events
+            while events:
+                event = events.popleft()
+                if event is not None:
+                    count += 1
+                    for handler in handlers.get(event.type, ()):
+                        handler(event)
+        return count
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import numbers
+import os, os.path
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class BarCache(object):
+    """
+    BarCache persists the normalized bars of a symbol (the datetime64
+    array and one array per field, as held by a BarStore) to a local
+    directory of .npy files, one entry per (source, symbol, query) key.
+
+    Entries are loaded with np.load(mmap_mode='r'), so a cached run
+    starts without parsing anything and concurrent processes share the
+    same pages through the OS page cache.
+
+    Every entry records a validator describing the state of its source
+    when it was written (e.g. file mtime and size, or row count and
+    max date of a table). An entry is only used while the current
+    validator of the source is identical.
+
+    Object columns are stored as float64 when they hold numbers (e.g.
+    the Decimal values of DECIMAL columns returned by MySQL drivers)
+    and as fixed-width strings otherwise (e.g. industry, sector), since
+    .npy files holding Python objects cannot be mapped.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Parameters:
+        cache_dir - Directory holding the cache entries, created if needed.
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(source, symbol, query):
+        """
+        Returns the cache key of a symbol's bars read from a source
+        (e.g. 'csv' or 'mysql') with a given query or path.
+        """
+        text = json.dumps([source, symbol, query], default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, validator):
+        """
+        Returns the (datetimes, columns) of an entry as memory-mapped
+        arrays, or None if there is no valid entry for the validator.
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta['validator'] != json.loads(json.dumps(validator, default=str)):
+            return None
+
+        def load_array(name):
+            return np.load(os.path.join(path, '%s.npy' % name), mmap_mode='r')
+
+        try:
+            datetimes = load_array('datetime')
+            columns = {f: load_array('field_%d' % i) for i, f in enumerate(meta['fields'])}
+        except (OSError, ValueError):
+            # The entry was replaced while being read
+            return None
+        return datetimes, columns
+
+    def store(self, key, validator, datetimes, columns):
+        """
+        Writes an entry, replacing any previous one. The entry is
+        written to a temporary directory first and moved into place,
+        so concurrent readers never see a partial entry.
+        """
+        tmp = tempfile.mkdtemp(dir=self.cache_dir)
+        np.save(os.path.join(tmp, 'datetime.npy'), np.asarray(datetimes))
+        for i, values in enumerate(columns.values()):
+            values = _storable(values)
+            np.save(os.path.join(tmp, 'field_%d.npy' % i), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'validator': validator, 'fields': list(columns)}, f, default=str)
+
+        # The previous entry is moved aside before it is deleted, so a
+        # reader never finds its arrays half removed
+        path = self._path(key)
+        old = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            os.rename(path, os.path.join(old, 'entry'))
+        except OSError:
+            pass
+        shutil.rmtree(old, ignore_errors=True)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process stored the same entry concurrently
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _storable(values):
+    """
+    Returns an object column as float64 if it holds only numbers (or
+    None), and as fixed-width strings otherwise. Other columns are
+    returned as they are.
+    """
+    values = np.asarray(values)
+    if values.dtype != object:
+        return values
+    if all(v is None or (isinstance(v, numbers.Number) and not isinstance(v, bool))
+           for v in values):
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    return values.astype(str)
+
+
+def file_validator(path):
+    """
+    Returns the validator of a file: its modification time and size.
+    """
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
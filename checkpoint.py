@@ -0,0 +1,165 @@
+import pickle
+
+import numpy as np
+
+from align import KWayMerge
+from backtest import Backtest
+from event import next_sequence, restore_sequence
+
+# A checkpoint file holds two pickles: the state of the DataHandler,
+# then the strategy, portfolio, broker and pending events. References
+# to the DataHandler, the EventBus and the cross-section vectors are
+# stored by name and bound to those of the resuming run when loaded.
+VERSION = 1
+
+
+class _Pickler(pickle.Pickler):
+    # Pickles the components, naming the objects shared with the DataHandler
+
+    def __init__(self, file, data, events):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.shared = {id(data): 'data', id(events): 'events'}
+        for field, (position, vector) in data.cross_sections.items():
+            self.shared[id(vector)] = ('cross_section', field)
+
+    def persistent_id(self, obj):
+        return self.shared.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    # Unpickles the components onto the DataHandler and EventBus of the resuming run
+
+    def __init__(self, file, data, events):
+        super().__init__(file)
+        self.data = data
+        self.events = events
+
+    def persistent_load(self, pid):
+        if pid == 'data':
+            return self.data
+        if pid == 'events':
+            return self.events
+        if isinstance(pid, tuple) and pid[0] == 'cross_section':
+            return self.data.get_cross_section(pid[1])
+        raise pickle.UnpicklingError("Unknown reference in checkpoint: %r" % (pid,))
+
+
+def _check_data(data):
+    if not hasattr(data, 'merge'):
+        raise ValueError("Checkpoints need a HistoricDataHandler, not %s" % type(data).__name__)
+    if getattr(data, 'resolution_data', None):
+        raise ValueError("Checkpoints do not cover the further resolutions of a tick handler")
+
+
+def _pending(events):
+    # Removes and returns the events waiting on the bus
+    pending = []
+    while not events.empty():
+        event = events.get()
+        if event is not None:
+            pending.append(event)
+    return pending
+
+
+def save_checkpoint(backtest, path):
+    """
+    Writes the state of a Backtest to path: the data handler's lookback
+    buffers and position in the timeline, and the strategy, portfolio
+    and broker with everything they hold (positions, holdings and
+    their history, indicators, working orders...) along with any
+    events pending on the bus.
+
+    The loaded history itself is not stored; resume() continues from
+    a handler reloaded from the (possibly extended) source.
+
+    Parameters:
+    backtest - The Backtest, between two bars, e.g. after run().
+    path - The checkpoint file to write.
+    """
+    data = backtest.data
+    _check_data(data)
+
+    pending = _pending(backtest.events)
+    for event in pending:
+        backtest.events.put(event)
+
+    data_state = {
+        'version': VERSION,
+        'symbol_list': list(data.symbol_list),
+        'lookback': data.lookback,
+        'latest_symbol_data': data.latest_symbol_data,
+        'updated_symbols': data.updated_symbols,
+        'current_datetime': data.current_datetime,
+        'sequence': next_sequence(),
+    }
+    components = {
+        'strategy': backtest.strategy,
+        'portfolio': backtest.portfolio,
+        'broker': backtest.broker,
+        'pending': pending,
+    }
+    with open(path, 'wb') as f:
+        pickle.dump(data_state, f, pickle.HIGHEST_PROTOCOL)
+        _Pickler(f, data, backtest.events).dump(components)
+
+
+def _restore_data(data, state):
+    """
+    Restores the lookback buffers and timeline position of a freshly
+    created data handler, skipping every bar up to the checkpoint.
+    """
+    if list(data.symbol_list) != state['symbol_list']:
+        raise ValueError("The checkpoint was taken over another symbol list")
+
+    data.lookback = max(data.lookback, state['lookback'])
+    data.latest_symbol_data = state['latest_symbol_data']
+    for ring in data.latest_symbol_data.values():
+        if ring.capacity < data.lookback:
+            ring.resize(data.lookback)
+    data.updated_symbols = state['updated_symbols']
+    data.current_datetime = state['current_datetime']
+    data.cross_sections = {}
+
+    current = data.current_datetime
+    data.merge = KWayMerge(data.symbol_list)
+    for s in data.symbol_list:
+        if current is not None:
+            cursors = getattr(data.bars, 'cursors', None)
+            if cursors is not None:
+                cursors[s] = int(np.searchsorted(data.bars.datetimes[s], current, side='right'))
+            else:
+                while True:
+                    timestamp = data.bars.peek_datetime(s)
+                    if timestamp is None or timestamp > current:
+                        break
+                    data.bars.next_bar(s)
+        data._schedule_next(s)
+
+
+def resume(path, data, events, profiler=None):
+    """
+    Resumes a run from a checkpoint written by save_checkpoint() and
+    returns a Backtest whose run() processes only the bars after it,
+    giving the same results as a run over the whole history.
+
+    Parameters:
+    path - The checkpoint file.
+    data - A new HistoricDataHandler over the same symbols, loaded from
+           the source extended with the new bars. Bars up to the
+           checkpoint may be missing, e.g. with a later start_date.
+    events - The EventBus of data.
+    profiler - Optional LoopProfiler, see Backtest.
+    """
+    _check_data(data)
+    with open(path, 'rb') as f:
+        data_state = pickle.load(f)
+        if data_state.get('version') != VERSION:
+            raise ValueError("Unsupported checkpoint version: %r" % data_state.get('version'))
+        _restore_data(data, data_state)
+        components = _Unpickler(f, data, events).load()
+
+    restore_sequence(data_state['sequence'])
+    for event in components['pending']:
+        events.put(event)
+    return Backtest(data, components['strategy'], components['portfolio'],
+                    components['broker'], events, profiler)
@@ -1,10 +1,18 @@
 import datetime
+import functools
+import numbers
 import os, os.path
+import queue
+import threading
+import numpy as np
 import pandas as pd
 import mysql.connector
 
 from abc import ABCMeta, abstractmethod
 
+from align import KWayMerge, FORWARD_FILL, UPDATED_ONLY
+from bars import BarStore, RingBuffer, to_datetime64
+from cache import BarCache, file_validator
 from event import MarketEvent
 
 class DataHandler(object):
@@ -13,7 +21,7 @@ class DataHandler(object):
     all subsequent (inherited) data handlers (both live and historic).
 
     The goal of a (derived) DataHandler object is to output a generated
-    set of bars (OLHCVI) for each symbol requested. 
+    set of bars (OLHCVI) for each symbol requested.
 
     This will replicate how a live strategy would function as current
     market data would be sent "down the pipe". Thus a historic and live
@@ -30,6 +38,14 @@ class DataHandler(object):
         """
         raise NotImplementedError("Should implement get_latest_bars()")
 
+    @abstractmethod
+    def get_latest_bars_values(self, symbol, val_type, N=1):
+        """
+        Returns the last N values of a single field (e.g. 'close')
+        as a NumPy array, or fewer if less bars are available.
+        """
+        raise NotImplementedError("Should implement get_latest_bars_values()")
+
     @abstractmethod
     def update_bars(self):
         """
@@ -38,16 +54,221 @@ class DataHandler(object):
         """
         raise NotImplementedError("Should implement update_bars()")
 
-class HistoricCSVDataHandler(DataHandler):
+    def require_lookback(self, N):
+        """
+        Declares that a consumer will request up to N bars at once.
+        Handlers keeping a bounded lookback must retain at least N bars.
+        """
+        pass
+
+class HistoricDataHandler(DataHandler):
+    """
+    HistoricDataHandler holds the complete history of every symbol
+    in a columnar BarStore and releases it one bar at a time by
+    advancing a per-symbol cursor. Released bars are pushed into a
+    fixed-capacity RingBuffer per symbol (latest_symbol_data), so the
+    lookback seen by the rest of the system uses flat memory however
+    long the run is. Subclasses only need to load their source into
+    self.bars and call _init_universe(); besides a BarStore, the source
+    can be any object offering dtypes(), peek_datetime() and next_bar()
+    per symbol, such as the MySQLStreamingBarSource.
+
+    The capacity of the ring buffers is the largest lookback declared
+    through require_lookback(), e.g. by a strategy needing its
+    long_window of bars.
+
+    Symbols may have uneven histories: the per-symbol timestamp streams
+    are merged into one universe timeline with a KWayMerge, and each
+    update_bars() call releases the next timestamp. With align set to
+    FORWARD_FILL every symbol that has started repeats its last bar
+    when it has no update; with UPDATED_ONLY only the symbols trading
+    at that timestamp are updated. Either way the symbols updated by
+    the last call are listed in self.updated_symbols, and its timestamp
+    is held in self.current_datetime.
+
+    get_cross_section() offers the latest value of a field across the
+    whole universe as one vector, kept up to date as bars are released.
+    """
+
+    def _init_universe(self):
+        """
+        Creates the lookback ring buffer of every symbol and
+        seeds the merge of the symbols' timestamp streams.
+        """
+        if self.align not in (FORWARD_FILL, UPDATED_ONLY):
+            raise ValueError("Unknown alignment mode: %s" % self.align)
+
+        self.latest_symbol_data = {
+            s: RingBuffer(self.bars.dtypes(s), self.lookback)
+            for s in self.symbol_list
+        }
+        self.updated_symbols = []
+        self.current_datetime = None
+        self.symbol_index = {s: i for i, s in enumerate(self.symbol_list)}
+        self.cross_sections = {}
+        self.merge = KWayMerge(self.symbol_list)
+        for s in self.symbol_list:
+            self._schedule_next(s)
+
+    def _schedule_next(self, symbol):
+        """
+        Pushes the timestamp of the next unreleased bar of
+        the symbol, if any, onto the merge.
+        """
+        timestamp = self.bars.peek_datetime(symbol)
+        if timestamp is not None:
+            self.merge.push(timestamp, symbol)
+
+    def _add_symbol(self, symbol, source, query, validator, load):
+        """
+        Adds a symbol's history to the bar store, going through the
+        BarCache in self.cache when one is configured.
+
+        Parameters:
+        symbol - The ticker symbol.
+        source - Name of the source, e.g. 'csv' or 'mysql'.
+        query - The path or query the bars are read with.
+        validator - Description of the current state of the source; a
+                    cached entry is only used if it was stored with the
+                    same validator.
+        load - Callable reading the source, returning (datetimes, columns).
+        """
+        if self.cache is None:
+            self.bars.add_symbol(symbol, *load())
+            return
+
+        key = self.cache.key(source, symbol, query)
+        cached = self.cache.load(key, validator)
+        if cached is None:
+            datetimes, columns = load()
+            self.cache.store(key, validator, to_datetime64(datetimes), columns)
+            cached = self.cache.load(key, validator)
+            if cached is None:
+                # Replaced by another process meanwhile
+                cached = datetimes, columns
+        self.bars.add_symbol(symbol, *cached)
+
+    def require_lookback(self, N):
+        """
+        Declares that a consumer will request up to N bars at once,
+        growing the lookback ring buffers if necessary.
+        """
+        if N > self.lookback:
+            self.lookback = N
+            for ring in self.latest_symbol_data.values():
+                ring.resize(N)
+
+    def get_latest_bars(self, symbol, N=1):
+        """
+        Returns the last N bars as a list of tuples
+        (symbol, datetime, field_1, ... field_n), or N-k if less available.
+        """
+        try:
+            return self.latest_symbol_data[symbol].tuples(symbol, N)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def get_latest_bars_values(self, symbol, val_type, N=1):
+        """
+        Returns a zero-copy NumPy view of the last N values of val_type
+        ('datetime' or any of the handler fields), or N-k if less available.
+        """
+        try:
+            return self.latest_symbol_data[symbol].values(val_type, N)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def get_latest_bar_value(self, symbol, val_type):
+        """
+        Returns the latest value of val_type for the symbol.
+        """
+        try:
+            return self.latest_symbol_data[symbol].last(val_type)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def get_latest_bar_datetime(self, symbol):
+        """
+        Returns the datetime of the latest bar for the symbol.
+        """
+        return self.get_latest_bar_value(symbol, 'datetime')
+
+    def get_cross_section(self, val_type):
+        """
+        Returns a float64 vector of the latest val_type of every symbol,
+        aligned with symbol_list (see symbol_index), NaN for symbols
+        without a bar yet. The same vector is updated in place by every
+        later update_bars() call.
+        """
+        section = self.cross_sections.get(val_type)
+        if section is None:
+            vector = np.full(len(self.symbol_list), np.nan)
+            position = None
+            for i, s in enumerate(self.symbol_list):
+                ring = self.latest_symbol_data[s]
+                position = ring.names.index(val_type)
+                if len(ring):
+                    vector[i] = ring.last(val_type)
+            section = self.cross_sections[val_type] = (position, vector)
+        return section[1]
+
+    def _update_cross_sections(self, symbol, bar):
+        # Writes a released bar (datetime, field_1, ... field_n) into the cross-sections
+        i = self.symbol_index[symbol]
+        for position, vector in self.cross_sections.values():
+            vector[i] = bar[position]
+
+    def get_latest_bars_array(self, symbol, N=1):
+        """
+        Returns the last N bars as a NumPy structured array,
+        or N-k if less available.
+        """
+        try:
+            return self.latest_symbol_data[symbol].array(N)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def update_bars(self):
+        """
+        Pushes the bars of the next timestamp of the universe to the
+        latest_symbol_data structure. The backtest stops once every
+        symbol has run out of data.
+        """
+        step = self.merge.pop()
+        if step is None:
+            self.continue_backtest = False
+            return
+
+        timestamp, symbols = step
+        for s in symbols:
+            bar = self.bars.next_bar(s)
+            self.latest_symbol_data[s].append(bar)
+            if self.cross_sections:
+                self._update_cross_sections(s, bar)
+            self._schedule_next(s)
+
+        if self.align == FORWARD_FILL and len(symbols) < len(self.symbol_list):
+            updated = set(symbols)
+            for s in self.symbol_list:
+                if s not in updated and len(self.latest_symbol_data[s]) > 0:
+                    self.latest_symbol_data[s].pad(timestamp)
+
+        self.updated_symbols = symbols
+        self.current_datetime = timestamp
+        self.events.put(MarketEvent.shared())
+
+class HistoricCSVDataHandler(HistoricDataHandler):
     """
     HistoricCSVDataHandler is designed to read CSV files for
     each requested symbol from disk and provide an interface
     to obtain the "latest" bar in a manner identical to a live
-    trading interface. 
+    trading interface.
     """
 
+    fields = ['open', 'high', 'low', 'close', 'adjClose', 'volume']
 
-    def __init__(self, events ,csv_dir, symbol_list):
+    def __init__(self, events ,csv_dir, symbol_list, lookback=1, align=FORWARD_FILL,
+                 cache_dir=None):
         """
         Initialises the historic data handler by requesting
         the location of the CSV files and a list of symbols.
@@ -59,97 +280,314 @@ class HistoricCSVDataHandler(DataHandler):
         events - The Event Queue.
         csv_dir - Absolute directory path to the CSV files.
         symbol_list - A list of symbol strings.
+        lookback - Initial number of bars kept per symbol, see require_lookback().
+        align - FORWARD_FILL or UPDATED_ONLY, see HistoricDataHandler.
+        cache_dir - Directory of a BarCache holding the parsed files, which
+                    is invalidated by the file modification time and size.
         """
         self.events = events
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
+        self.cache = BarCache(cache_dir) if cache_dir is not None else None
 
-        self.symbol_data = {}
-        self.latest_symbol_data = {}
-        self.continue_backtest = True       
+        self.bars = BarStore(self.fields)
+        self.lookback = lookback
+        self.align = align
+        self.continue_backtest = True
 
         self._open_convert_csv_files()
+        self._init_universe()
 
     def _open_convert_csv_files(self):
         """
         Opens the CSV files from the data directory, converting
-        them into pandas DataFrames within a symbol dictionary.
+        them into columnar arrays within the bar store. Dates are
+        parsed once here rather than on every bar.
 
         For this handler it will be assumed that the data is
         taken from DTN IQFeed. Thus its format will be respected.
         """
         column_names = ['Date','Open','High','Low','Close', "Adj Close", 'Volume']
         # column_names = ['Date','Open','High','Low','Close','WAP','No. of Shares','No. of Trades','Total Turnover','Deliverable Quantity','% Deli. Qty to Traded Qty','Spread H-L','Spread C-O']
-        
-        comb_index = None
-        for s in self.symbol_list:
+
+        def load(path):
             # Load the CSV file with no header information, indexed on date
-            self.symbol_data[s] = pd.io.parsers.read_csv(
-                                        os.path.join(self.csv_dir, '%s.csv' % s),
-                                        header=0, index_col=0, 
+            df = pd.io.parsers.read_csv(
+                                        path,
+                                        header=0, index_col=0,
                                         names= column_names
                                     )
+            try:
+                datetimes = pd.to_datetime(df.index, format='%Y-%m-%d')
+            except ValueError:
+                # Intraday files, e.g. '2001-01-02 09:30:00'
+                datetimes = pd.to_datetime(df.index)
+            return (
+                datetimes,
+                dict(zip(self.fields, (df[c].to_numpy() for c in column_names[1:])))
+            )
+
+        # Each symbol keeps its own dates; update_bars aligns the universe
+        for s in self.symbol_list:
+            path = os.path.abspath(os.path.join(self.csv_dir, '%s.csv' % s))
+            self._add_symbol(
+                s, 'csv', path,
+                file_validator(path) if self.cache is not None else None,
+                lambda: load(path)
+            )
 
-            # Combine the index to pad forward values
-            if comb_index is None:
-                comb_index = self.symbol_data[s].index
-            else:
-                comb_index.union(self.symbol_data[s].index)
-
-            self.latest_symbol_data[s] = []
 
+class _MySQLChunkProducer(object):
+    """
+    Fetches the chunks of every streamed symbol on a single background
+    thread and database connection, so a universe of thousands of
+    tables needs one connection rather than one per symbol.
+
+    Streams request chunks with request(); the requests are served in
+    order, each with one keyset-paginated query (rows after the last
+    date already fetched for the symbol, LIMIT chunk_size) whose rows
+    are converted into columnar arrays and handed to the stream's queue.
+    """
 
-        # Reindex the dataframes
-        for s in self.symbol_list:
-            self.symbol_data[s] = self.symbol_data[s].reindex(index=comb_index, method='pad').iterrows()
+    def __init__(self, connector, db_config):
+        """
+        Parameters:
+        connector - Module providing connect(**db_config).
+        db_config - A dictionary containing MySQL connection parameters.
+        """
+        self.connector = connector
+        self.db_config = db_config
+        self.requests = queue.Queue()
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
 
-    def _get_new_bar(self, symbol):
-            """
-            Returns the latest bar from the data feed as a tuple of 
-            (sybmbol, datetime, open, low, high, close, volume).
-            """
-            for b in self.symbol_data[symbol]:
-                yield tuple([
-                    symbol, datetime.datetime.strptime(b[0], '%Y-%m-%d').date(), b[1][0], b[1][1], b[1][2], b[1][3], b[1][4] , b[1][5]])
+    def request(self, stream):
+        self.requests.put(stream)
 
-    def get_latest_bars(self, symbol, N=1):
+    def close(self):
         """
-        Returns the last N bars from the latest_symbol list,
-        or N-k if less available.
+        Stops the thread once the current query is done and closes the connection.
         """
+        self.closed = True
+        if self.thread.is_alive():
+            self.requests.put(None)
+            self.thread.join()
+
+    def _produce(self):
+        conn = None
         try:
-            bars_list = self.latest_symbol_data[symbol]
-            print('bars_list[-N:]', bars_list[-N:])
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-        else:
-            return bars_list[-N:]
+            conn = self.connector.connect(**self.db_config)
+            cursor = conn.cursor()
+        except Exception as e:
+            self.error = e
+        try:
+            while True:
+                stream = self.requests.get()
+                if stream is None:
+                    break
+                if self.closed:
+                    continue
+                if self.error is not None:
+                    stream.chunks.put(self.error)
+                    continue
+                try:
+                    stream.chunks.put(self._fetch(cursor, stream))
+                except Exception as e:
+                    self.error = e
+                    stream.chunks.put(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _fetch(self, cursor, stream):
+        # The next chunk of the stream, or None at the end of its table
+        if stream.fetched_all:
+            return None
+        cursor.execute(*stream.query(stream.last_fetched))
+        rows = cursor.fetchall()
+        if len(rows) < stream.chunk_size:
+            stream.fetched_all = True
+        if not rows:
+            return None
+        values = list(zip(*rows))
+        stream.last_fetched = values[0][-1]
+        return stream.convert(values)
+
+
+class _MySQLSymbolStream(object):
+    """
+    Streams the rows of one symbol's table in chunks fetched by the
+    shared _MySQLChunkProducer, keeping up to `prefetch` chunks
+    requested ahead while the event loop consumes the current one.
+    Memory is therefore bounded by chunk_size * (prefetch + 1) rows
+    per symbol, whatever the size of the table.
+
+    Chunks are paginated on the Date column, which must be unique
+    within a table, as it is for bars.
+    """
 
-    def update_bars(self):
+    def __init__(self, producer, query, fields, chunk_size, prefetch):
         """
-        Pushes the latest bar to the latest_symbol_data structure
-        for all symbols in the symbol list.
+        Parameters:
+        producer - The _MySQLChunkProducer fetching the chunks.
+        query - Callable of the last fetched date (None at first)
+                returning the (query, parameters) of the next chunk.
+        fields - Ordered list of the streamed field names.
+        chunk_size - Number of rows per chunk.
+        prefetch - Number of chunks requested ahead.
         """
-        for s in self.symbol_list:
-            try:
-                bar = self._get_new_bar(s).__next__()
-            except StopIteration:
-                self.continue_backtest = False
+        self.producer = producer
+        self.query = query
+        self.fields = fields
+        self.chunk_size = chunk_size
+
+        # Written by the producer thread only
+        self.last_fetched = None
+        self.fetched_all = False
+        # Dtypes of the datetimes and of each field, fixed by the first chunk
+        self.datetime_dtype = None
+        self.numeric = None
+
+        self.chunks = queue.Queue()
+        self.datetimes = None
+        self.columns = None
+        self.position = 0
+        self.exhausted = False
+
+        for _ in range(max(prefetch, 1)):
+            producer.request(self)
+
+    def convert(self, values):
+        """
+        Converts the columns of a chunk (the Date column, then one per
+        field) into arrays of the dtypes fixed by the first chunk, so
+        that every chunk fits the RingBuffers sized from it: numeric
+        fields are float64 with NULL as NaN, other fields objects, and
+        the datetimes keep one datetime64 unit (microseconds for a
+        DATETIME column, days for DATE).
+        """
+        dates = values[0]
+        datetimes = to_datetime64(dates)
+        if self.datetime_dtype is None:
+            if isinstance(dates[0], datetime.datetime):
+                datetimes = datetimes.astype('datetime64[us]')
+            self.datetime_dtype = datetimes.dtype
+            self.numeric = [
+                any(v is not None for v in column) and
+                all(v is None or isinstance(v, numbers.Number) for v in column)
+                for column in values[1:]
+            ]
+        elif datetimes.dtype != self.datetime_dtype:
+            if self.datetime_dtype == np.dtype('datetime64[D]'):
+                # Casting would drop the time of day
+                raise ValueError(
+                    "Intraday rows from %s in a table streamed at day resolution" % dates[0]
+                )
+            datetimes = datetimes.astype(self.datetime_dtype)
+
+        columns = {}
+        for f, numeric, column in zip(self.fields, self.numeric, values[1:]):
+            if numeric:
+                # NULLs become NaN
+                columns[f] = np.array(column, dtype=np.float64)
             else:
-                if bar is not None:
-                    self.latest_symbol_data[s].append(bar)
-        self.events.put(MarketEvent())
+                columns[f] = np.array(column, dtype=object)
+        return datetimes, columns
 
+    def _fill(self):
+        """
+        Makes sure the current chunk has an unread row, fetching the
+        next chunk if needed. Returns False once the table is exhausted.
+        """
+        while self.datetimes is None or self.position >= len(self.datetimes):
+            if self.exhausted:
+                return False
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if chunk is None:
+                self.exhausted = True
+                return False
+            self.producer.request(self)
+            self.datetimes, self.columns = chunk
+            self.position = 0
+        return True
+
+    def dtypes(self):
+        if not self._fill():
+            return [('datetime', 'datetime64[D]')] + [(f, object) for f in self.fields]
+        return [('datetime', self.datetimes.dtype)] + [
+            (f, self.columns[f].dtype) for f in self.fields
+        ]
+
+    def peek_datetime(self):
+        if not self._fill():
+            return None
+        return self.datetimes[self.position]
+
+    def next_bar(self):
+        if not self._fill():
+            return None
+        i = self.position
+        self.position += 1
+        return (self.datetimes[i],) + tuple(self.columns[f][i] for f in self.fields)
+
+
+class MySQLStreamingBarSource(object):
+    """
+    MySQLStreamingBarSource stands in for the BarStore of a
+    HistoricMySQLDataHandler when rows are streamed in chunks rather
+    than loaded up front. It offers the same per-symbol dtypes(),
+    peek_datetime() and next_bar() methods, backed by one
+    _MySQLSymbolStream per symbol, all fed by one _MySQLChunkProducer.
+    """
+
+    def __init__(self, fields, streams, producer):
+        """
+        Parameters:
+        fields - Ordered list of the streamed field names.
+        streams - Dictionary of symbol -> _MySQLSymbolStream.
+        producer - The _MySQLChunkProducer of the streams.
+        """
+        self.fields = list(fields)
+        self.streams = streams
+        self.producer = producer
 
-class HistoricMySQLDataHandler(DataHandler):
+    def dtypes(self, symbol):
+        return self.streams[symbol].dtypes()
+
+    def peek_datetime(self, symbol):
+        return self.streams[symbol].peek_datetime()
+
+    def next_bar(self, symbol):
+        return self.streams[symbol].next_bar()
+
+    def close(self):
+        self.producer.close()
+
+
+class HistoricMySQLDataHandler(HistoricDataHandler):
     """
     HistoricMySQLDataHandler is designed to read historical data for
     each requested symbol from a MySQL database and provide an interface
     to obtain the "latest" bar in a manner identical to a live
-    trading interface. 
+    trading interface.
+
+    By default every table is loaded into a BarStore before the backtest
+    starts. With chunk_size set, rows are instead streamed in chunks by
+    one background thread over a single connection while the backtest
+    runs (see MySQLStreamingBarSource), so startup time and peak memory
+    no longer grow with the size of the tables. In both modes only the requested
+    columns and the rows within [start_date, end_date] are queried.
     """
 
-    def __init__(self, events, db_config, symbol_list):
+    fields = ['open', 'high', 'low', 'close', 'adjClose', 'volume', 'industry', 'sector']
+
+    def __init__(self, events, db_config, symbol_list, lookback=1, align=FORWARD_FILL,
+                 start_date=None, end_date=None, fields=None, chunk_size=None,
+                 prefetch=2, connector=mysql.connector, cache_dir=None):
         """
         Initialises the historic data handler by requesting
         the database connection parameters and a list of symbols.
@@ -158,80 +596,168 @@ class HistoricMySQLDataHandler(DataHandler):
         events - The Event Queue.
         db_config - A dictionary containing MySQL connection parameters.
         symbol_list - A list of symbol strings.
+        lookback - Initial number of bars kept per symbol, see require_lookback().
+        align - FORWARD_FILL or UPDATED_ONLY, see HistoricDataHandler.
+        start_date - Only bars on or after this date are read, e.g. the
+                     start_date of the portfolio.
+        end_date - Only bars on or before this date are read.
+        fields - Subset of the table columns to read, defaults to all fields.
+        chunk_size - Number of rows per chunk, each fetched with one query
+                     (rows dated after the previous chunk, LIMIT
+                     chunk_size); None loads every table up front.
+                     Streamed numeric fields are float64, see
+                     _MySQLSymbolStream.convert().
+        prefetch - Number of chunks per symbol fetched ahead by the
+                   background thread in chunked mode.
+        connector - Module providing connect(**db_config), e.g. a
+                    MySQL-compatible driver or a mock for testing.
+        cache_dir - Directory of a BarCache holding the loaded tables, which
+                    is invalidated by the row count and max date of the
+                    queried rows. Not used in chunked mode.
         """
         self.events = events
         self.db_config = db_config
         self.symbol_list = symbol_list
+        self.start_date = start_date
+        self.end_date = end_date
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.connector = connector
+        self.cache = BarCache(cache_dir) if cache_dir is not None else None
+        if fields is not None:
+            self.fields = list(fields)
+
+        self.lookback = lookback
+        self.align = align
+        self.continue_backtest = True
+
+        if chunk_size is None:
+            self.bars = BarStore(self.fields)
+            self._open_convert_db_data()
+        else:
+            self.bars = self._open_db_streams()
+        self._init_universe()
 
-        self.symbol_data = {}
-        self.latest_symbol_data = {}
-        self.symbol_generators = {}
-        self.continue_backtest = True       
-
-        self._open_convert_db_data()
+    def _query(self, symbol, columns=None, after=None, limit=None):
+        """
+        Returns the (query, parameters) selecting the projected columns
+        of a symbol's table within the date bounds, in date order,
+        optionally only the first limit rows dated after after.
+        """
+        # Ensure these column names match your database table column names
+        if columns is None:
+            columns = "Date, %s" % ", ".join(self.fields)
+        query = "SELECT %s FROM `%s`" % (columns, symbol)
+        conditions, params = [], []
+        if self.start_date is not None:
+            conditions.append("Date >= %s")
+            params.append(self.start_date)
+        if self.end_date is not None:
+            conditions.append("Date <= %s")
+            params.append(self.end_date)
+        if after is not None:
+            conditions.append("Date > %s")
+            params.append(after)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if columns.startswith("Date"):
+            query += " ORDER BY Date"
+        if limit is not None:
+            query += " LIMIT %d" % limit
+        return query, tuple(params)
 
     def _open_convert_db_data(self):
         """
         Opens the database connection, fetching historical data for each symbol
-        and converting them into pandas DataFrames within a symbol dictionary.
+        and converting them into columnar arrays within the bar store.
         """
-        conn = mysql.connector.connect(**self.db_config)
+        conn = self.connector.connect(**self.db_config)
         cursor = conn.cursor()
 
-        for s in self.symbol_list:
-            cursor.execute(f"SELECT * FROM {s}")
+        def load(query):
+            cursor.execute(*query)
             rows = cursor.fetchall()
 
-            # Ensure these column names match your database table column names
-            columns = ['Date', 'open', 'high', 'low', 'close', 'adjClose', 'volume', 'industry', 'sector']
-
-            df = pd.DataFrame(rows, columns=columns)
+            df = pd.DataFrame(rows, columns=['Date'] + self.fields)
             df.set_index('Date', inplace=True)
-            self.symbol_data[s] = df
-            self.latest_symbol_data[s] = []
-            self.symbol_generators[s] = self._create_symbol_generator(s)
+            return df.index, {f: df[f].to_numpy() for f in self.fields}
+
+        for s in self.symbol_list:
+            query = self._query(s)
+            validator = None
+            if self.cache is not None:
+                # Cheap check of whether the queried rows have changed
+                cursor.execute(*self._query(s, columns="COUNT(*), MAX(Date)"))
+                validator = list(cursor.fetchall()[0])
+            self._add_symbol(s, 'mysql', (self._connection_identity(), query),
+                             validator, lambda: load(query))
 
         cursor.close()
         conn.close()
 
-    def _create_symbol_generator(self, symbol):
-        """
-        Creates a generator that yields bars from the DataFrame.
-        """
-        for index, row in self.symbol_data[symbol].iterrows():
-            yield tuple([
-                symbol, index, row['open'], row['high'], row['low'], row['close'], row['adjClose'], row['volume'], row['industry'], row['sector']
-            ])
+    def _connection_identity(self):
+        # Where the tables are read from, part of the cache keys so that
+        # the same table of two databases has distinct entries
+        return [self.db_config.get(k) for k in ('host', 'port', 'unix_socket', 'database', 'user')]
 
-    def _get_new_bar(self, symbol):
+    def _open_db_streams(self):
         """
-        Returns the latest bar from the data feed as a tuple of 
-        (symbol, datetime, open, low, high, close, adjClose, volume, industry, sector).
+        Starts a chunked, prefetching stream of every symbol's table,
+        all fetched over one connection.
         """
-        return next(self.symbol_generators[symbol], None)
+        producer = _MySQLChunkProducer(self.connector, self.db_config)
+        streams = {}
+        for s in self.symbol_list:
+            query = functools.partial(self._chunk_query, s)
+            streams[s] = _MySQLSymbolStream(
+                producer, query, self.fields, self.chunk_size, self.prefetch
+            )
+        return MySQLStreamingBarSource(self.fields, streams, producer)
 
-    def get_latest_bars(self, symbol, N=1):
+    def _chunk_query(self, symbol, after):
+        return self._query(symbol, after=after, limit=self.chunk_size)
+
+    def update_bars(self):
+        HistoricDataHandler.update_bars(self)
+        if not self.continue_backtest:
+            self.close()
+
+    def close(self):
         """
-        Returns the last N bars from the latest_symbol list,
-        or N-k if less available.
+        Stops the background fetching of chunked mode and closes its
+        connection, e.g. when a run ends before the data does. Called
+        automatically once every table is exhausted.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-        else:
-            return bars_list[-N:]
+        if isinstance(self.bars, MySQLStreamingBarSource):
+            self.bars.close()
 
-    def update_bars(self):
+
+class HistoricArrayDataHandler(HistoricDataHandler):
+    """
+    HistoricArrayDataHandler serves bars that are already loaded into
+    a BarStore, e.g. arrays shared by a parent process or read from a
+    cache, without touching the original source again.
+    """
+
+    def __init__(self, events, bars, symbol_list, lookback=1, align=FORWARD_FILL):
         """
-        Pushes the latest bar to the latest_symbol_data structure
-        for all symbols in the symbol list.
+        Parameters:
+        events - The Event Queue.
+        bars - A BarStore holding the history of every symbol. Its arrays
+               are shared, not copied; only the cursors are private.
+        symbol_list - A list of symbol strings.
+        lookback - Initial number of bars kept per symbol, see require_lookback().
+        align - FORWARD_FILL or UPDATED_ONLY, see HistoricDataHandler.
         """
-        for s in self.symbol_list:
-            bar = self._get_new_bar(s)
-            print('bar', bar)
-            if bar is not None:
-                self.latest_symbol_data[s].append(bar)
-            else:
-                self.continue_backtest = False
-        self.events.put(MarketEvent())
\ No newline at end of file
+        self.events = events
+        self.symbol_list = symbol_list
+
+        self.fields = list(bars.fields)
+        self.bars = BarStore(self.fields)
+        for s in symbol_list:
+            self.bars.add_symbol(s, bars.datetimes[s], bars.columns[s])
+        self.lookback = lookback
+        self.align = align
+        self.continue_backtest = True
+
+        self._init_universe()
@@ -1,59 +1,172 @@
-# from _typeshed import Self
+import itertools
+
+# Monotonic sequence shared by all events, in order of creation
+_sequence = itertools.count(1)
+
+# Default of FillEvent's deprecated commision keyword, told apart from None
+_UNSET = object()
+
+
+def next_sequence():
+    """
+    Returns the sequence number the next event will get.
+    """
+    global _sequence
+    following = next(_sequence)
+    _sequence = itertools.count(following)
+    return following
+
+
+def restore_sequence(following):
+    """
+    Makes the next event get the sequence number following,
+    e.g. when resuming a run from a checkpoint.
+    """
+    global _sequence
+    _sequence = itertools.count(following)
+
 
 class Event(object):
-    pass
+    """
+    Event is the base class of all events. Events use __slots__ with
+    the event type as a class attribute, so no per-instance __dict__
+    is allocated in the hot loop.
+
+    Every event carries a monotonic sequence number, giving a total
+    order of the events of a run for ordering and debugging.
+    """
+    __slots__ = ('sequence',)
+
+    def __repr__(self):
+        fields = ', '.join(
+            '%s=%r' % (name, getattr(self, name))
+            for cls in reversed(type(self).__mro__)
+            for name in getattr(cls, '__slots__', ())
+        )
+        return '%s(%s)' % (type(self).__name__, fields)
 
 class MarketEvent(Event):
+    """
+    Signals that the DataHandler has released new bars. A MarketEvent
+    carries no data, so the data handlers put the instance returned by
+    shared() instead of allocating a new one on every bar.
+    """
+    __slots__ = ()
+    type = 'MARKET'
+
+    _shared = None
 
     def __init__(self):
-        self.type = 'MARKET'
+        self.sequence = next(_sequence)
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the reusable MarketEvent, stamped with a new sequence
+        number. It must not be held past the dispatch of the next bar.
+        """
+        event = cls._shared
+        if event is None:
+            event = cls._shared = cls()
+        else:
+            event.sequence = next(_sequence)
+        return event
 
 class SignalEvent(Event):
+    __slots__ = ('symbol', 'datetime', 'signal_type', 'quantity')
+    type = 'SIGNAL'
 
     def __init__(self,symbol,datetime,signal_type,quantity):
 
-        self.type = 'SIGNAL'
+        self.sequence = next(_sequence)
         self.symbol = symbol
         self.datetime = datetime
         self.signal_type = signal_type
         self.quantity = quantity
 
 class OrderEvent(Event):
+    """
+    An order sent to the ExecutionHandler. order_type is 'MKT', 'LMT'
+    (price is the limit price), 'STP' (price is the stop price) or
+    'CXL', which cancels the order whose sequence is order_id.
+    """
+    __slots__ = ('symbol', 'order_type', 'quantity', 'direction', 'price', 'order_id')
+    type = 'ORDER'
+
+    def __init__(self,symbol,order_type,quantity,direction, price=None, order_id=None):
 
-    def __init__(self,symbol,order_type,quantity,direction):
-        
-        self.type = 'ORDER'
+        self.sequence = next(_sequence)
         self.symbol = symbol
         self.order_type = order_type
         self.quantity = quantity
         self.direction = direction
+        self.price = price
+        self.order_id = order_id
 
     def print_order(self):
 
-        print("Order: Symbol=%s, Type=%s, Quantity=%s, Direction=%s") % \
-            (self.symbol, self.order_type, self.quantity, self.direction)
+        print("Order: Symbol=%s, Type=%s, Quantity=%s, Direction=%s" %
+            (self.symbol, self.order_type, self.quantity, self.direction))
 
 class FillEvent(Event):
+    """
+    A filled order as returned by the ExecutionHandler. commission
+    defaults to the flat 1 per fill charged by the simulated broker;
+    None calculates it from the quantity with _calculate_commission().
+    The former misspelt commision keyword is still accepted in its place.
+    """
+    __slots__ = ('timeindex', 'symbol', 'exchange', 'quantity', 'direction',
+                 'fill_cost', 'commission')
+    type = 'FILL'
 
-    def __init__(self,timeindex,symbol,exchange,quantity,direction,fill_cost, commision=True):
+    def __init__(self,timeindex,symbol,exchange,quantity,direction,fill_cost, commission=1.0,
+                 commision=_UNSET):
 
-        self.type = 'FILL'
+        self.sequence = next(_sequence)
         self.timeindex = timeindex
         self.symbol = symbol
         self.exchange = exchange
         self.quantity = quantity
         self.direction = direction
         self.fill_cost = fill_cost
-        self.commision = commision
 
-        if commision is None:
-            self.commision = self._calculate_commision()
-        else:
-            self.commission = commision
+        if commision is not _UNSET:
+            commission = commision
+        if commission is None:
+            commission = self._calculate_commission()
+        self.commission = commission
 
-    def _calculate_commision(self):
+    @property
+    def commision(self):
+        # Former misspelt name of commission, kept for existing callers
+        return self.commission
+
+    @commision.setter
+    def commision(self, value):
+        self.commission = value
+
+    def _calculate_commission(self):
         """
         TODO: Commission fees to be implemented
         """
         # between 1 and 2%
-        return max(1.5, 0.015 * self.quantity)
\ No newline at end of file
+        return max(1.5, 0.015 * self.quantity)
+
+class CancelEvent(Event):
+    """
+    A working order cancelled by the ExecutionHandler, either at the
+    request of a 'CXL' OrderEvent or on its own (e.g. by self-trade
+    prevention), with the quantity it had left unfilled. order_id is
+    the sequence of the cancelled OrderEvent.
+    """
+    __slots__ = ('timeindex', 'symbol', 'quantity', 'direction', 'order_id')
+    type = 'CANCEL'
+
+    def __init__(self, timeindex, symbol, quantity, direction, order_id):
+
+        self.sequence = next(_sequence)
+        self.timeindex = timeindex
+        self.symbol = symbol
+        self.quantity = quantity
+        self.direction = direction
+        self.order_id = order_id
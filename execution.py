@@ -1,9 +1,16 @@
 import datetime
+import heapq
 import queue
+import random
 
 from abc import ABCMeta, abstractmethod
+from collections import deque
 
-from event import FillEvent, OrderEvent
+import numpy as np
+import pandas as pd
+
+from event import CancelEvent, FillEvent, OrderEvent
+from orderbook import BookOrder, OrderBook
 
 
 
@@ -14,6 +21,11 @@ class ExecutionAbstractClass(metaclass = ABCMeta):
     def execute_order(self, event):
         pass
 
+    def update_timeindex(self, event):
+        # Called on every MarketEvent; handlers holding orders across
+        # bars override it
+        pass
+
 class SimulatedExecutionHandler(ExecutionAbstractClass):
     
     #Simply converts all OrderEvents to FillEvents with no latency or slippage
@@ -29,4 +41,530 @@ class SimulatedExecutionHandler(ExecutionAbstractClass):
         
         if isinstance(event, OrderEvent):
             fill_event = FillEvent(datetime.datetime.utcnow(), event.symbol, "EXCHANGE", event.quantity, event.direction, None)
-            self.event_queue.put(fill_event)
\ No newline at end of file
+            self.event_queue.put(fill_event)
+
+class LatencyModel(metaclass = ABCMeta):
+    #Abstract class of the delays between placing an order and its arrival at the market
+
+    @abstractmethod
+    def delay(self, order):
+        """
+        Returns the delay of the OrderEvent in nanoseconds.
+        """
+        raise NotImplementedError("Should implement delay()")
+
+
+class FixedLatency(LatencyModel):
+    """
+    Delays every order by the same time.
+    """
+
+    def __init__(self, delay=0):
+        """
+        Parameters:
+        delay - The delay as a pandas offset or timedelta, e.g. '1min'.
+        """
+        self._delay = pd.Timedelta(delay).value
+
+    def delay(self, order):
+        return self._delay
+
+
+class RandomLatency(LatencyModel):
+    """
+    Delays orders by a time drawn uniformly between low and high.
+    """
+
+    def __init__(self, low, high, seed=None):
+        """
+        Parameters:
+        low - The shortest delay as a pandas offset or timedelta.
+        high - The longest delay as a pandas offset or timedelta.
+        seed - Seed of the random generator, for repeatable backtests.
+        """
+        self.low = pd.Timedelta(low).value
+        self.high = pd.Timedelta(high).value
+        self.rng = random.Random(seed)
+
+    def delay(self, order):
+        return self.rng.randint(self.low, self.high)
+
+
+class SlippageModel(metaclass = ABCMeta):
+    #Abstract class of the price paid over the bar price by a fill
+
+    @abstractmethod
+    def price(self, direction, quantity, price, volume):
+        """
+        Returns the per-unit price of a fill of quantity in direction
+        ('BUY' or 'SELL') against a bar of price and volume.
+        """
+        raise NotImplementedError("Should implement price()")
+
+
+class NoSlippage(SlippageModel):
+    """
+    Fills at the bar price.
+    """
+
+    def price(self, direction, quantity, price, volume):
+        return price
+
+
+class FixedSlippage(SlippageModel):
+    """
+    Fills a fixed number of basis points off the bar price, buys
+    paying more and sells receiving less.
+    """
+
+    def __init__(self, bps):
+        """
+        Parameters:
+        bps - The slippage in basis points.
+        """
+        self.fraction = bps * 1e-4
+
+    def price(self, direction, quantity, price, volume):
+        if direction == 'BUY':
+            return price * (1.0 + self.fraction)
+        return price * (1.0 - self.fraction)
+
+
+class VolumeShareSlippage(SlippageModel):
+    """
+    Moves the price by impact times the square of the fill's share of
+    the bar volume, so larger fills pay increasingly more.
+    """
+
+    def __init__(self, impact=0.1):
+        """
+        Parameters:
+        impact - Price move, as a fraction, of a fill of the whole bar volume.
+        """
+        self.impact = impact
+
+    def price(self, direction, quantity, price, volume):
+        share = min(quantity / volume, 1.0) if volume > 0 else 1.0
+        move = self.impact * share * share
+        if direction == 'BUY':
+            return price * (1.0 + move)
+        return price * (1.0 - move)
+
+
+class ParticipationModel(metaclass = ABCMeta):
+    #Abstract class of the quantity a bar can fill
+
+    @abstractmethod
+    def capacity(self, volume):
+        """
+        Returns the quantity of a symbol that may be filled against a
+        bar of volume, summed over all orders.
+        """
+        raise NotImplementedError("Should implement capacity()")
+
+
+class VolumeParticipation(ParticipationModel):
+    """
+    Fills at most a fraction of the volume of each bar; the rest of
+    the orders stays resting and fills on the following bars.
+    """
+
+    def __init__(self, fraction=0.1):
+        """
+        Parameters:
+        fraction - The share of the bar volume that may be filled.
+        """
+        self.fraction = fraction
+
+    def capacity(self, volume):
+        # A missing volume (NaN, as in the cross-section of a symbol
+        # without a bar yet or a source with gaps) fills nothing
+        if np.isnan(volume):
+            return 0
+        return int(self.fraction * volume)
+
+
+class _RestingOrder(object):
+    # An order waiting to fill and its unfilled quantity
+    __slots__ = ('order', 'remaining')
+
+    def __init__(self, order):
+        self.order = order
+        self.remaining = order.quantity
+
+
+class ScheduledExecutionHandler(ExecutionAbstractClass):
+    """
+    ScheduledExecutionHandler simulates the delay, price impact and
+    limited liquidity of a market. Orders wait in a heap keyed on the
+    simulated time at which they reach the market (the bar time they
+    were placed at plus the latency model's delay), and fill against
+    the first bar at or after it.
+
+    Due orders of a symbol fill in arrival order against its bar in
+    effect, at price_field moved by the slippage model, and up to the
+    capacity of the participation model: what a bar cannot fill stays
+    resting for the following bars, as partial fills. Symbols without
+    a new bar (forward-filled) do not fill.
+
+    update_timeindex() must be called on every MarketEvent after the
+    bar has been updated, as Backtest does.
+    """
+
+    def __init__(self, events, data, latency=None, slippage=None,
+                 participation=None, price_field=None, volume_field='volume'):
+        """
+        Parameters:
+        events - The EventBus.
+        data - The DataHandler object providing the bars.
+        latency - A LatencyModel, defaults to no delay.
+        slippage - A SlippageModel, defaults to NoSlippage.
+        participation - A ParticipationModel, defaults to filling
+                        orders whole whatever the volume.
+        price_field - The bar field orders fill at, defaults to the field
+                      NaivePortfolio marks positions at: the second field
+                      of the data handler ('high' for OHLCV bars).
+        volume_field - The bar field holding the volume.
+        """
+        self.events = events
+        self.data = data
+        self.latency = latency if latency is not None else FixedLatency()
+        self.slippage = slippage if slippage is not None else NoSlippage()
+        self.participation = participation
+        self.price_field = price_field
+        self.volume_field = volume_field
+
+        # (due time in ns, order sequence, _RestingOrder)
+        self.heap = []
+        # Due orders per symbol, in arrival order
+        self.active = {}
+        # Quantity left to fill per symbol against the current bar
+        self.capacity = {}
+        self._now = None
+        self._updated = set()
+
+    def __len__(self):
+        # Number of orders not yet completely filled
+        return len(self.heap) + sum(len(orders) for orders in self.active.values())
+
+    def _advance(self):
+        # Moves to the current bar: resets the capacities and
+        # activates the orders that have reached the market
+        now = np.datetime64(self.data.current_datetime, 'ns').astype(np.int64).item()
+        if now != self._now:
+            self._now = now
+            self.capacity.clear()
+            self._updated = set(self.data.updated_symbols)
+            if self.price_field is None:
+                self.price_field = self.data.fields[1]
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            resting = heapq.heappop(heap)[2]
+            symbol = resting.order.symbol
+            if symbol not in self.active:
+                self.active[symbol] = deque()
+            self.active[symbol].append(resting)
+        return now
+
+    def _fill(self, symbol):
+        """
+        Fills the due orders of the symbol against its latest bar for as
+        much as the bar's capacity allows.
+        """
+        orders = self.active[symbol]
+        price = self.data.get_latest_bar_value(symbol, self.price_field)
+        volume = None
+        left = None
+        if self.participation is not None or not isinstance(self.slippage, NoSlippage):
+            volume = self.data.get_latest_bar_value(symbol, self.volume_field)
+        if self.participation is not None:
+            left = self.capacity.get(symbol)
+            if left is None:
+                left = self.participation.capacity(volume)
+
+        timeindex = self.data.current_datetime
+        while orders and (left is None or left > 0):
+            resting = orders[0]
+            quantity = resting.remaining if left is None else min(resting.remaining, left)
+            order = resting.order
+            fill_cost = self.slippage.price(order.direction, quantity, price, volume)
+            self.events.put(FillEvent(
+                timeindex, symbol, "EXCHANGE", quantity, order.direction, fill_cost
+            ))
+            resting.remaining -= quantity
+            if left is not None:
+                left -= quantity
+            if resting.remaining == 0:
+                orders.popleft()
+
+        if left is not None:
+            self.capacity[symbol] = left
+        if not orders:
+            del self.active[symbol]
+
+    def execute_order(self, event):
+        """
+        Schedules the OrderEvent to reach the market after the latency
+        model's delay, filling it straight away when there is none.
+        """
+        if not isinstance(event, OrderEvent):
+            return
+        now = self._advance()
+        resting = _RestingOrder(event)
+        delay = self.latency.delay(event)
+        if delay > 0:
+            heapq.heappush(self.heap, (now + delay, event.sequence, resting))
+            return
+        symbol = event.symbol
+        if symbol not in self.active:
+            self.active[symbol] = deque()
+        self.active[symbol].append(resting)
+        if symbol in self._updated:
+            self._fill(symbol)
+
+    def update_timeindex(self, event):
+        """
+        Fills the orders due by the new bar of the symbols it updates.
+        """
+        self._advance()
+        if len(self.active) < len(self._updated):
+            symbols = [s for s in self.active if s in self._updated]
+        else:
+            symbols = [s for s in self.data.updated_symbols if s in self.active]
+        for symbol in symbols:
+            self._fill(symbol)
+
+
+class OrderBookExecutionHandler(ExecutionAbstractClass):
+    """
+    OrderBookExecutionHandler works the orders of every symbol in an
+    in-process OrderBook, honouring the order_type of the OrderEvents:
+    'MKT', 'LMT' (price is the limit), 'STP' (price is the stop, the
+    order turns into a market order once traded through) and 'CXL'
+    (cancels the working order whose sequence is order_id).
+
+    The working orders all belong to the one portfolio on the bus, so
+    an incoming order never trades with them: the resting limit orders
+    on the other side of its book that it would match are cancelled
+    instead (cancel-resting self-trade prevention). Every cancelled
+    order, whether requested by a 'CXL' order or by self-trade
+    prevention, is reported with a CancelEvent. The order trades
+    against the current bar at price_field if it reaches it, up to the
+    capacity of the participation model, and then works in the book:
+    limit orders rest, market orders and triggered stops wait for
+    liquidity. On each new bar the waiting market orders
+    and triggered stops fill at the open (stops no better than their
+    stop price), then the resting limit orders the bar's range reaches
+    fill at their limit or the open if better, all in priority order
+    until the bar's capacity runs out, leaving partial fills.
+
+    update_timeindex() must be called on every MarketEvent after the
+    bar has been updated, as Backtest does.
+    """
+
+    def __init__(self, events, data, participation=None, price_field=None,
+                 volume_field='volume'):
+        """
+        Parameters:
+        events - The EventBus.
+        data - The DataHandler object providing the bars, with open,
+               high and low fields.
+        participation - A ParticipationModel capping the quantity each
+                        bar fills per direction, defaults to no cap.
+        price_field - The bar field incoming orders trade at, defaults to
+                      the field NaivePortfolio marks positions at: the
+                      second field of the data handler ('high' for
+                      OHLCV bars).
+        volume_field - The bar field holding the volume.
+        """
+        self.events = events
+        self.data = data
+        self.participation = participation
+        self.price_field = price_field
+        self.volume_field = volume_field
+
+        self.books = {}
+        # Quantity left to fill per (symbol, direction) against the current bar
+        self.capacity = {}
+        # Latest price_field value per symbol, read once per bar
+        self.prices = {}
+        # Cross-sections of the bar fields read by _fill_bar()
+        self.sections = None
+        self._now = None
+        self._updated = set()
+
+    def book(self, symbol):
+        """
+        Returns the OrderBook of the symbol.
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        return book
+
+    def _advance(self):
+        # Moves to the current bar, resetting the capacities
+        now = self.data.current_datetime
+        if now is not self._now and now != self._now:
+            self._now = now
+            self.capacity.clear()
+            self.prices.clear()
+            self._updated = set(self.data.updated_symbols)
+            if self.price_field is None:
+                self.price_field = self.data.fields[1]
+
+    def _available(self, symbol, direction):
+        # Quantity the current bar can still fill, None for no cap
+        if symbol not in self._updated:
+            return 0
+        if self.participation is None:
+            return None
+        key = (symbol, direction)
+        left = self.capacity.get(key)
+        if left is None:
+            volume = self.data.get_latest_bar_value(symbol, self.volume_field)
+            left = self.capacity[key] = self.participation.capacity(volume)
+        return left
+
+    def cancel_order(self, symbol, order_id):
+        """
+        Cancels a working order. Returns the quantity it had left, or
+        None if it is not working.
+        """
+        return self.book(symbol).cancel(order_id)
+
+    def execute_order(self, event):
+        """
+        Matches the OrderEvent against the book and the current bar,
+        then works what is left of it in the book.
+        """
+        if not isinstance(event, OrderEvent):
+            return
+        now = self.data.current_datetime
+        # Identity first: comparing datetime64 values is comparatively slow
+        if now is not self._now and now != self._now:
+            self._advance()
+        symbol = event.symbol
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.book(symbol)
+        order_type = event.order_type
+        if order_type == 'CXL':
+            entry = book.orders.get(event.order_id)
+            remaining = book.cancel(event.order_id)
+            if remaining is not None:
+                self.events.put(CancelEvent(
+                    self.data.current_datetime, symbol, remaining, entry.direction, entry.order_id
+                ))
+            return
+
+        entry = BookOrder(event)
+        direction = entry.direction
+        buy = direction == 'BUY'
+        price = self.prices.get(symbol)
+        if price is None:
+            price = self.prices[symbol] = self.data.get_latest_bar_value(symbol, self.price_field)
+        if order_type == 'LMT':
+            limit = entry.price
+        elif order_type == 'MKT':
+            limit = None
+        elif order_type != 'STP':
+            raise ValueError("Unknown order type: %s" % order_type)
+        elif (price < entry.price) if buy else (price > entry.price):
+            book.add_stop(entry)
+            return
+        else:
+            # A stop already traded through, a market order from here on
+            limit = None
+
+        side = book.asks if buy else book.bids
+        if side.live:
+            best = side.best()
+            if limit is None or side.sign * best <= side.sign * limit:
+                # Self-trade prevention: every working order belongs to the
+                # portfolio on the bus, so matching would be a wash trade
+                for resting, remaining in book.cancel_crossing(direction, limit, entry.remaining):
+                    self.events.put(CancelEvent(
+                        self.data.current_datetime, symbol, remaining,
+                        resting.direction, resting.order_id
+                    ))
+
+        if limit is None or (price <= limit if buy else price >= limit):
+            available = self._available(symbol, direction)
+            quantity = entry.remaining if available is None else min(entry.remaining, available)
+            if quantity > 0:
+                self.events.put(FillEvent(
+                    self.data.current_datetime, symbol, "EXCHANGE", quantity, direction, price
+                ))
+                if available is not None:
+                    self.capacity[(symbol, direction)] = available - quantity
+                entry.remaining -= quantity
+                if entry.remaining == 0:
+                    return
+
+        if order_type == 'LMT':
+            book.add_limit(entry)
+        else:
+            book.add_market(entry)
+
+    def _fill_bar(self, symbol, book):
+        """
+        Fills the working orders of the symbol against its new bar.
+        """
+        sections = self.sections
+        if sections is None:
+            sections = self.sections = [
+                self.data.get_cross_section(field)
+                for field in ('open', 'high', 'low', self.volume_field)
+            ]
+        i = self.data.symbol_index[symbol]
+        bar_open, high, low, volume = [section.item(i) for section in sections]
+        if book.buy_stops or book.sell_stops:
+            book.triggered(low, high)
+
+        put = self.events.put
+        now = self.data.current_datetime
+        participation = self.participation
+        capacity = self.capacity
+        for direction, side in (('BUY', book.bids), ('SELL', book.asks)):
+            market = book.market[direction]
+            if not market and not side.live:
+                continue
+            buy = direction == 'BUY'
+            available = None
+            if participation is not None:
+                available = capacity.get((symbol, direction))
+                if available is None:
+                    available = participation.capacity(volume)
+            filled = 0
+            if market:
+                for entry, quantity in book.fill_market(direction, available):
+                    if entry.order.order_type == 'STP':
+                        price = max(entry.price, bar_open) if buy else min(entry.price, bar_open)
+                    else:
+                        price = bar_open
+                    put(FillEvent(now, symbol, "EXCHANGE", quantity, direction, price))
+                    filled += quantity
+            if side.live and (available is None or available > filled):
+                for entry, quantity in side.take(low if buy else high,
+                                                 None if available is None else available - filled,
+                                                 book.orders):
+                    price = min(entry.price, bar_open) if buy else max(entry.price, bar_open)
+                    put(FillEvent(now, symbol, "EXCHANGE", quantity, direction, price))
+                    filled += quantity
+            if available is not None:
+                capacity[(symbol, direction)] = available - filled
+
+    def update_timeindex(self, event):
+        """
+        Fills the working orders of the symbols the new bar updates.
+        """
+        self._advance()
+        if len(self.books) < len(self._updated):
+            symbols = [s for s in self.books if s in self._updated]
+        else:
+            symbols = [s for s in self.data.updated_symbols if s in self.books]
+        for symbol in symbols:
+            book = self.books[symbol]
+            if book.orders:
+                self._fill_bar(symbol, book)
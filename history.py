@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class History(object):
+    """
+    History is an append-only, time x column record of values stored
+    in chunk-allocated NumPy arrays, together with the datetime of each
+    row. Appending a row writes into the current chunk; when a chunk is
+    full a new one is allocated, so existing rows are never copied while
+    the history grows. The full matrix is assembled once, on export.
+    """
+
+    def __init__(self, columns, chunk_size=4096, dtype=np.float64):
+        """
+        Parameters:
+        columns - Ordered list of column names.
+        chunk_size - Number of rows allocated at a time.
+        dtype - The NumPy dtype of the values.
+        """
+        self.columns = list(columns)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+
+        self._chunks = []
+        self._datetimes = []
+        self._row = chunk_size
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, datetime, values):
+        """
+        Appends a row given as a sequence of values in column order.
+        """
+        if self._row == self.chunk_size:
+            self._chunks.append(np.empty((self.chunk_size, len(self.columns)), dtype=self.dtype))
+            self._datetimes.append(np.empty(self.chunk_size, dtype=object))
+            self._row = 0
+        self._chunks[-1][self._row] = values
+        self._datetimes[-1][self._row] = datetime
+        self._row += 1
+        self.count += 1
+
+    def __getstate__(self):
+        # Only the filled rows are pickled, as one matrix
+        return {
+            'columns': self.columns, 'chunk_size': self.chunk_size, 'dtype': self.dtype,
+            'values': self.values, 'datetimes': self.datetimes,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['columns'], state['chunk_size'], state['dtype'])
+        values = state['values']
+        datetimes = state['datetimes']
+        for start in range(0, len(values), self.chunk_size):
+            chunk = np.empty((self.chunk_size, len(self.columns)), dtype=self.dtype)
+            dts = np.empty(self.chunk_size, dtype=object)
+            rows = values[start:start + self.chunk_size]
+            chunk[:len(rows)] = rows
+            dts[:len(rows)] = datetimes[start:start + self.chunk_size]
+            self._chunks.append(chunk)
+            self._datetimes.append(dts)
+            self._row = len(rows)
+        self.count = len(values)
+
+    def last(self):
+        """
+        Returns a view of the latest row.
+        """
+        return self._chunks[-1][self._row - 1]
+
+    @property
+    def values(self):
+        """
+        The time x column matrix of all rows.
+        """
+        if not self._chunks:
+            return np.empty((0, len(self.columns)), dtype=self.dtype)
+        return np.concatenate(self._chunks)[:self.count]
+
+    @property
+    def datetimes(self):
+        """
+        The object array of row datetimes.
+        """
+        if not self._chunks:
+            return np.empty(0, dtype=object)
+        return np.concatenate(self._datetimes)[:self.count]
+
+    def column(self, name):
+        """
+        Returns all values of a single column.
+        """
+        return self.values[:, self.columns.index(name)]
@@ -0,0 +1,253 @@
+import math
+
+from abc import ABCMeta, abstractmethod
+from collections import deque
+
+
+class Indicator(object):
+    """
+    Indicator is an abstract base class providing an interface for
+    all subsequent (inherited) streaming indicators.
+
+    A streaming indicator keeps running state and is fed one bar at a
+    time through update(), which costs O(1) regardless of the length
+    of its window. The latest result is held in self.value, which is
+    None until enough bars have been seen (see ready).
+    """
+
+    __metaclass__ = ABCMeta
+
+    value = None
+
+    @property
+    def ready(self):
+        """
+        True once the indicator has seen enough bars to produce a value.
+        """
+        return self.value is not None
+
+    @abstractmethod
+    def update(self, value):
+        """
+        Feeds the next observation and returns the updated value.
+        """
+        raise NotImplementedError("Should implement update()")
+
+
+class _RollingWindow(object):
+    """
+    Fixed-length FIFO of the last `period` observations, used by the
+    windowed indicators to know which value drops out on each update.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+
+    def push(self, value):
+        """
+        Appends value and returns the observation that fell out of the
+        window, or None while the window is still filling.
+        """
+        dropped = self.values[0] if len(self.values) == self.period else None
+        self.values.append(value)
+        return dropped
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SMA(Indicator):
+    """
+    Simple moving average over the last `period` observations.
+
+    The running sum uses Neumaier compensated summation so that adding
+    and removing values over millions of bars does not drift away from
+    a freshly computed mean.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = _RollingWindow(period)
+        self._sum = 0.0
+        self._compensation = 0.0
+        self.value = None
+
+    def _add(self, x):
+        t = self._sum + x
+        if abs(self._sum) >= abs(x):
+            self._compensation += (self._sum - t) + x
+        else:
+            self._compensation += (x - t) + self._sum
+        self._sum = t
+
+    def update(self, value):
+        dropped = self.window.push(value)
+        self._add(value)
+        if dropped is not None:
+            self._add(-dropped)
+        if len(self.window) == self.period:
+            self.value = (self._sum + self._compensation) / self.period
+        return self.value
+
+
+class EMA(Indicator):
+    """
+    Exponential moving average with span `period`, equivalent to
+    pandas' ewm(span=period, adjust=False). A value is produced once
+    `period` observations have been seen (min_periods=period).
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1.0)
+        self.count = 0
+        self._ema = None
+        self.value = None
+
+    def update(self, value):
+        if self._ema is None:
+            self._ema = value
+        else:
+            self._ema += self.alpha * (value - self._ema)
+        self.count += 1
+        if self.count >= self.period:
+            self.value = self._ema
+        return self.value
+
+
+class RollingStd(Indicator):
+    """
+    Rolling standard deviation over the last `period` observations,
+    updated with Welford's add/remove recurrences for numerical
+    stability. ddof=1 matches pandas' rolling().std().
+    """
+
+    def __init__(self, period, ddof=1):
+        self.period = period
+        self.ddof = ddof
+        self.window = _RollingWindow(period)
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.value = None
+
+    def update(self, value):
+        dropped = self.window.push(value)
+        if dropped is None:
+            n = len(self.window)
+            delta = value - self.mean
+            self.mean += delta / n
+            self._m2 += delta * (value - self.mean)
+        else:
+            old_mean = self.mean
+            self.mean += (value - dropped) / self.period
+            self._m2 += (value - dropped) * (value - self.mean + dropped - old_mean)
+        if len(self.window) == self.period and self.period > self.ddof:
+            self.value = math.sqrt(max(self._m2, 0.0) / (self.period - self.ddof))
+        return self.value
+
+
+class RollingMax(Indicator):
+    """
+    Rolling maximum over the last `period` observations, kept in a
+    monotonic deque so each update is amortised O(1).
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self._deque = deque()
+        self.value = None
+
+    def _dominates(self, kept, value):
+        return kept > value
+
+    def update(self, value):
+        i = self.count
+        d = self._deque
+        while d and not self._dominates(d[-1][1], value):
+            d.pop()
+        d.append((i, value))
+        if d[0][0] <= i - self.period:
+            d.popleft()
+        self.count += 1
+        if self.count >= self.period:
+            self.value = d[0][1]
+        return self.value
+
+
+class RollingMin(RollingMax):
+    """
+    Rolling minimum over the last `period` observations, kept in a
+    monotonic deque so each update is amortised O(1).
+    """
+
+    def _dominates(self, kept, value):
+        return kept < value
+
+
+class ATR(Indicator):
+    """
+    Average True Range over `period` bars using Wilder's smoothing:
+    the first value is the mean of the first `period` true ranges,
+    after which atr = (atr * (period - 1) + tr) / period.
+
+    Unlike the single-series indicators, update() takes the bar's
+    high, low and close.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.prev_close = None
+        self._tr_sum = 0.0
+        self.value = None
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+
+        if self.count < self.period:
+            self._tr_sum += tr
+        elif self.count == self.period:
+            self.value = (self._tr_sum + tr) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+
+class Window(Indicator):
+    """
+    The last `period` observations of a series, oldest first. The
+    value is the window itself (a deque), available from the first
+    observation on, so consumers can also look at a partial window.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = _RollingWindow(period)
+        self.value = None
+
+    def update(self, value):
+        self.window.push(value)
+        self.value = self.window.values
+        return self.value
+
+
+class ZScore(Indicator):
+    """
+    Standard score of an observation against a mean and standard
+    deviation, typically a rolling SMA and RollingStd of the same
+    series; 0 while the deviation is 0. update() takes all three.
+    """
+
+    def __init__(self):
+        self.value = None
+
+    def update(self, value, mean, std):
+        self.value = (value - mean) / std if std else 0.0
+        return self.value
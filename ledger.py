@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+BUY = 1
+SELL = -1
+
+
+def _pyarrow():
+    # pyarrow is optional, only the Arrow and Parquet exports need it
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow/Parquet export requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class TradeLedger(object):
+    """
+    TradeLedger records every fill of a run in preallocated NumPy
+    arrays (timestamp, symbol id, side, quantity, price, commission),
+    doubling their capacity when full so an append costs amortised
+    O(1) with no Python object kept per fill.
+
+    Round trips are matched with vectorized operations over the whole
+    ledger, and the fills can be exported to pandas, Arrow or Parquet
+    straight from the arrays.
+    """
+
+    columns = ['timestamp', 'symbol', 'side', 'quantity', 'price', 'commission']
+
+    def __init__(self, symbol_list=(), capacity=1024):
+        """
+        Parameters:
+        symbol_list - The known symbols, which get the first symbol ids.
+                      Other symbols are added as they are recorded.
+        capacity - Number of fills allocated up front.
+        """
+        self.symbols = []
+        self.symbol_ids = {}
+        for s in symbol_list:
+            self._symbol_id(s)
+
+        self.count = 0
+        self._timestamp = np.empty(capacity, dtype='datetime64[us]')
+        self._symbol = np.empty(capacity, dtype=np.int32)
+        self._side = np.empty(capacity, dtype=np.int8)
+        self._quantity = np.empty(capacity, dtype=np.float64)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._commission = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+    def _symbol_id(self, symbol):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def _grow(self):
+        capacity = max(2 * len(self._price), 1)
+        for name in ('_timestamp', '_symbol', '_side', '_quantity', '_price', '_commission'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def record(self, timestamp, symbol, side, quantity, price, commission=0.0):
+        """
+        Appends a fill.
+
+        Parameters:
+        timestamp - The datetime of the fill.
+        symbol - The ticker symbol.
+        side - BUY (1) or SELL (-1), or the direction string 'BUY'/'SELL'.
+        quantity - The filled quantity, always positive.
+        price - The fill price per unit.
+        commission - The commission charged for the fill.
+        """
+        if self.count == len(self._price):
+            self._grow()
+        if isinstance(side, str):
+            side = BUY if side == 'BUY' else SELL
+        i = self.count
+        self._timestamp[i] = timestamp
+        self._symbol[i] = self._symbol_id(symbol)
+        self._side[i] = side
+        self._quantity[i] = quantity
+        self._price[i] = price
+        self._commission[i] = commission
+        self.count += 1
+
+    def arrays(self):
+        """
+        Returns a dictionary of column name -> NumPy view of the
+        recorded fills; symbol holds the symbol ids (see self.symbols).
+        """
+        n = self.count
+        return {
+            'timestamp': self._timestamp[:n],
+            'symbol': self._symbol[:n],
+            'side': self._side[:n],
+            'quantity': self._quantity[:n],
+            'price': self._price[:n],
+            'commission': self._commission[:n],
+        }
+
+    def to_frame(self):
+        """
+        Returns the fills as a DataFrame with a categorical symbol column.
+        """
+        columns = self.arrays()
+        columns['symbol'] = pd.Categorical.from_codes(columns['symbol'], self.symbols)
+        return pd.DataFrame(columns, columns=self.columns)
+
+    def to_arrow(self):
+        """
+        Returns the fills as a pyarrow Table with a dictionary-encoded
+        symbol column. Requires pyarrow.
+        """
+        pa = _pyarrow()
+        columns = self.arrays()
+        columns['symbol'] = pa.DictionaryArray.from_arrays(
+            pa.array(columns['symbol']), pa.array(self.symbols, type=pa.string())
+        )
+        return pa.table(columns)
+
+    def to_parquet(self, filename):
+        """
+        Writes the fills to a Parquet file. Requires pyarrow.
+        """
+        _pyarrow()
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(self.to_arrow(), filename)
+
+    def round_trips(self):
+        """
+        Matches the fills into round trips: a trip opens when a symbol's
+        position leaves zero and closes when it is back to zero, so
+        scaling in and out stays within one trip. A fill reversing the
+        position (long to short or back) is split at zero: the part
+        closing the position ends the trip and the rest opens the next,
+        the commission being shared in proportion. Trips still open at
+        the end of the ledger are left out.
+
+        Returns a DataFrame with one row per closed trip: symbol,
+        direction (1 long, -1 short), entry and exit time and price,
+        the largest absolute position, total commission, PnL net of
+        commission and holding period.
+        """
+        columns = self.arrays()
+        if self.count == 0:
+            return pd.DataFrame(columns=[
+                'symbol', 'direction', 'entry_time', 'exit_time', 'entry_price',
+                'exit_price', 'quantity', 'commission', 'pnl', 'holding'
+            ])
+
+        # Group the fills by symbol, keeping their order within a symbol
+        order = np.argsort(columns['symbol'], kind='stable')
+        symbol = columns['symbol'][order]
+        timestamp = columns['timestamp'][order]
+        price = columns['price'][order]
+        commission = columns['commission'][order]
+        signed = columns['side'][order] * columns['quantity'][order]
+        n = len(signed)
+
+        # Running position per symbol: the cumulative sum restarted at
+        # the first fill of every symbol
+        first = np.r_[True, symbol[1:] != symbol[:-1]]
+        total = np.cumsum(signed)
+        group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        position = total - (total[group_start] - signed[group_start])
+
+        # Split every fill crossing zero into a closing and an opening fill
+        before = position - signed
+        flip = before * position < -1e-9
+        if flip.any():
+            index = np.repeat(np.arange(n), np.where(flip, 2, 1))
+            opening = np.r_[False, index[1:] == index[:-1]]
+            closing = flip[index] & ~opening
+            part = np.where(closing, -before[index],
+                            np.where(opening, position[index], signed[index]))
+            commission = commission[index] * part / signed[index]
+            symbol, timestamp, price = symbol[index], timestamp[index], price[index]
+            first = first[index] & ~opening
+            position = np.where(closing, 0.0, position[index])
+            signed = part
+            n = len(signed)
+        flat = np.abs(position) < 1e-9
+
+        starts = np.flatnonzero(first | np.r_[True, flat[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        closed = flat[ends]
+
+        cash = -signed * price - commission
+        trips = pd.DataFrame({
+            'symbol': np.array(self.symbols, dtype=object)[symbol[starts]],
+            'direction': np.sign(signed[starts]).astype(np.int8),
+            'entry_time': timestamp[starts],
+            'exit_time': timestamp[ends],
+            'entry_price': price[starts],
+            'exit_price': price[ends],
+            'quantity': np.maximum.reduceat(np.abs(position), starts),
+            'commission': np.add.reduceat(commission, starts),
+            'pnl': np.add.reduceat(cash, starts),
+        })[closed].reset_index(drop=True)
+        trips['holding'] = trips['exit_time'] - trips['entry_time']
+        return trips
+
+    def summary(self):
+        """
+        Returns the round trip statistics: number of trades, win rate,
+        average and total PnL, and average holding period.
+        """
+        trips = self.round_trips()
+        trades = len(trips)
+        return {
+            'Trades': trades,
+            'Win Rate': float((trips['pnl'] > 0).mean()) if trades else float('nan'),
+            'Average PnL': float(trips['pnl'].mean()) if trades else float('nan'),
+            'Total PnL': float(trips['pnl'].sum()),
+            'Average Hold': trips['holding'].mean() if trades else pd.NaT,
+        }
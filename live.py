@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import json
+import time
+
+from array import array
+
+import numpy as np
+
+from align import KWayMerge, FORWARD_FILL, UPDATED_ONLY
+from bars import BarStore, RingBuffer
+from data import HistoricDataHandler
+from event import MarketEvent
+
+# The feed is newline-delimited JSON. The server first sends a header
+# {"fields": [...], "dtypes": {symbol: [[name, dtype], ...]}} and then
+# one message per timestamp of the universe:
+# {"datetime": "2001-01-02", "sent": <unix time>, "bars": {symbol: [field values]}}
+# The connection is closed at the end of the feed.
+
+
+def _plain(value):
+    # NumPy scalars to their Python equivalent for JSON
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ReplayServer(object):
+    """
+    ReplayServer streams stored history over a local TCP socket in the
+    feed format read by LiveDataHandler, replaying the bars of a loaded
+    BarStore (e.g. data.bars of a HistoricCSVDataHandler or a loaded
+    HistoricMySQLDataHandler) in timestamp order at a configurable rate.
+
+    Every client gets the whole replay from the start. Each message is
+    stamped with the time it was sent, so clients can measure latency.
+    """
+
+    def __init__(self, bars, symbol_list, rate=None, host='127.0.0.1', port=0):
+        """
+        Parameters:
+        bars - The BarStore holding the history to replay.
+        symbol_list - A list of symbol strings.
+        rate - Messages (timestamps) per second, None for as fast as possible.
+        host - The interface to listen on.
+        port - The port to listen on, 0 picks a free one (see self.port).
+        """
+        self.bars = bars
+        self.symbol_list = symbol_list
+        self.rate = rate
+        self.host = host
+        self.port = port
+        self.server = None
+
+    @classmethod
+    def from_handler(cls, data, rate=None, host='127.0.0.1', port=0):
+        """
+        Creates a ReplayServer of the history loaded by a HistoricDataHandler.
+        """
+        return cls(data.bars, data.symbol_list, rate, host, port)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _serve(self, reader, writer):
+        # A private BarStore over the same arrays, so every client
+        # replays with its own cursors
+        replay = BarStore(self.bars.fields)
+        for s in self.symbol_list:
+            replay.add_symbol(s, self.bars.datetimes[s], self.bars.columns[s])
+        merge = KWayMerge(self.symbol_list)
+        for s in self.symbol_list:
+            merge.push(replay.peek_datetime(s), s)
+
+        header = {
+            'fields': list(replay.fields),
+            'dtypes': {
+                s: [[name, np.dtype(dtype).str] for name, dtype in replay.dtypes(s)]
+                for s in self.symbol_list
+            },
+        }
+        writer.write(json.dumps(header).encode('utf-8') + b'\n')
+
+        start = time.perf_counter()
+        sent = 0
+        try:
+            while True:
+                step = merge.pop()
+                if step is None:
+                    break
+                timestamp, symbols = step
+                bars = {}
+                for s in symbols:
+                    bars[s] = [_plain(v) for v in replay.next_bar(s)[1:]]
+                    following = replay.peek_datetime(s)
+                    if following is not None:
+                        merge.push(following, s)
+
+                message = {'datetime': str(timestamp), 'sent': time.time(), 'bars': bars}
+                writer.write(json.dumps(message).encode('utf-8') + b'\n')
+                sent += 1
+
+                if self.rate:
+                    delay = start + sent / self.rate - time.perf_counter()
+                    if delay > 0:
+                        await writer.drain()
+                        await asyncio.sleep(delay)
+                elif sent % 256 == 0:
+                    await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class LiveDataHandler(HistoricDataHandler):
+    """
+    LiveDataHandler consumes bars from a socket feed (see ReplayServer)
+    and offers the same interface as the historic handlers: bars are
+    pushed into per-symbol RingBuffers, forward-filled or not as set by
+    align, and every message puts a MarketEvent on the bus.
+
+    update_bars_async() awaits the next message, so an asyncio loop
+    (Backtest.run_async) only wakes when data arrives. update_bars()
+    blocks on the socket the same way, for the synchronous Backtest.run.
+    The backtest ends when the feed closes.
+
+    For latency measurements, latest_sent and latest_received hold the
+    send and receive times (time.time()) of the latest message.
+    """
+
+    def __init__(self, events, host, port, symbol_list, lookback=1, align=FORWARD_FILL):
+        """
+        Parameters:
+        events - The EventBus.
+        host - Host of the feed.
+        port - Port of the feed.
+        symbol_list - A list of symbol strings.
+        lookback - Initial number of bars kept per symbol, see require_lookback().
+        align - FORWARD_FILL or UPDATED_ONLY, see HistoricDataHandler.
+        """
+        if align not in (FORWARD_FILL, UPDATED_ONLY):
+            raise ValueError("Unknown alignment mode: %s" % align)
+
+        self.events = events
+        self.host = host
+        self.port = port
+        self.symbol_list = symbol_list
+        self.lookback = lookback
+        self.align = align
+        self.continue_backtest = True
+
+        self.latest_symbol_data = {}
+        self.updated_symbols = []
+        self.current_datetime = None
+        self.symbol_index = {s: i for i, s in enumerate(symbol_list)}
+        self.cross_sections = {}
+        self.latest_sent = None
+        self.latest_received = None
+
+        self.reader = None
+        self.writer = None
+        self._loop = None
+
+    async def connect(self):
+        """
+        Connects to the feed and creates the ring buffers from its header.
+        """
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, limit=2 ** 20
+        )
+        header = json.loads(await self.reader.readline())
+        self.fields = header['fields']
+        self.latest_symbol_data = {
+            s: RingBuffer([(name, np.dtype(dtype)) for name, dtype in header['dtypes'][s]],
+                          self.lookback)
+            for s in self.symbol_list
+        }
+
+    async def update_bars_async(self):
+        """
+        Awaits the next message of the feed and pushes its bars to the
+        latest_symbol_data structure.
+        """
+        if self.reader is None:
+            await self.connect()
+
+        line = await self.reader.readline()
+        if not line:
+            self.continue_backtest = False
+            self.writer.close()
+            return
+
+        self.latest_received = time.time()
+        message = json.loads(line)
+        self.latest_sent = message['sent']
+
+        timestamp = np.datetime64(message['datetime'])
+        bars = message['bars']
+        for s, values in bars.items():
+            if s in self.latest_symbol_data:
+                bar = [timestamp] + values
+                self.latest_symbol_data[s].append(bar)
+                if self.cross_sections:
+                    self._update_cross_sections(s, bar)
+
+        if self.align == FORWARD_FILL:
+            for s in self.symbol_list:
+                if s not in bars and len(self.latest_symbol_data[s]) > 0:
+                    self.latest_symbol_data[s].pad(timestamp)
+
+        self.updated_symbols = [s for s in bars if s in self.latest_symbol_data]
+        self.current_datetime = timestamp
+        self.events.put(MarketEvent.shared())
+
+    def update_bars(self):
+        """
+        Blocking form of update_bars_async(), for use outside an asyncio loop.
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.update_bars_async())
+        if not self.continue_backtest:
+            self._loop.close()
+
+
+class LatencyMonitor(object):
+    """
+    LatencyMonitor measures the latency of a LiveDataHandler feed on
+    the EventBus: from the time a message was sent to the dispatch of
+    its MarketEvent (bar to market) and of every SignalEvent it
+    triggered (bar to signal).
+    """
+
+    def __init__(self, data, events):
+        """
+        Parameters:
+        data - The LiveDataHandler.
+        events - The EventBus; subscribe the monitor after the
+                 components so it sees their signals.
+        """
+        self.data = data
+        self.market = array('d')
+        self.signal = array('d')
+        events.subscribe('MARKET', self.on_market)
+        events.subscribe('SIGNAL', self.on_signal)
+
+    def on_market(self, event):
+        self.market.append(time.time() - self.data.latest_sent)
+
+    def on_signal(self, event):
+        self.signal.append(time.time() - self.data.latest_sent)
+
+    def summary(self):
+        """
+        Returns the count and p50/p90/p99/max latencies in microseconds
+        of the bar to market and bar to signal measurements.
+        """
+        summary = {}
+        for name, samples in (('market', self.market), ('signal', self.signal)):
+            values = np.frombuffer(samples, dtype=np.float64) * 1e6
+            summary[name] = {'count': len(values)}
+            if len(values):
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                summary[name].update({
+                    'p50_us': float(p50), 'p90_us': float(p90),
+                    'p99_us': float(p99), 'max_us': float(values.max()),
+                })
+        return summary
+
+
+def main():
+    # Serves CSV history for testing, e.g. python live.py --csv-dir csvs --symbols AAA --rate 100
+    from bus import EventBus
+    from data import HistoricCSVDataHandler
+
+    parser = argparse.ArgumentParser(description="Replays CSV history as a live feed.")
+    parser.add_argument('--csv-dir', required=True)
+    parser.add_argument('--symbols', nargs='+', required=True)
+    parser.add_argument('--rate', type=float, help="messages per second, default unthrottled")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args()
+
+    data = HistoricCSVDataHandler(EventBus(), args.csv_dir, args.symbols)
+    server = ReplayServer.from_handler(data, args.rate, args.host, args.port)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
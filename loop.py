@@ -1,4 +1,3 @@
-import queue
 import time
 import os, os.path
 import datetime
@@ -7,12 +6,8 @@ import warnings
 from simple import MovingAverageCrossoverStrategy
 warnings.filterwarnings("ignore")
 
-from event import (
-    MarketEvent,
-    SignalEvent,
-    OrderEvent,
-    FillEvent
-)
+from backtest import Backtest
+from bus import EventBus
 from data import HistoricCSVDataHandler, HistoricMySQLDataHandler
 # from strategy import BuyAndHoldStrategy
 from portfolio import NaivePortfolio, Portfolio
@@ -23,7 +18,7 @@ start_date = datetime.date(2001, 5, 5)
 
 CSV_DIR = os.path.join('csvs')
 
-event_queue = queue.Queue()
+event_queue = EventBus()
 
 symbolList = ['TATAMOTORS']
 
@@ -46,35 +41,8 @@ strategy = MovingAverageCrossoverStrategy(data,event_queue)
 # strategy = StopLossStrategy(data,event_queue,44,portfolio)
 broker = SimulatedExecutionHandler(event_queue)
 
-while True:
-    if data.continue_backtest is True:
-        # data.update_latest_data()
-        data.update_bars()
-    else:
-        break
-
-    while True:
-        try:
-            event = event_queue.get(block=False)
-        except queue.Empty:
-            break
-
-        if event is not None:
-            if isinstance(event, MarketEvent):
-                strategy.calculate_signals(event)
-                portfolio.update_timeindex(event)
-
-            elif isinstance(event, SignalEvent):
-                portfolio.update_signal(event)
-                
-            elif isinstance(event, OrderEvent):
-                broker.execute_order(event)
-
-            elif isinstance(event, FillEvent):
-                portfolio.update_fill(event)
-
-    stats = portfolio.output_summary_stats()    
-    # time.sleep(10)
+backtest = Backtest(data, strategy, portfolio, broker, event_queue)
+backtest.run()
 
 stats = portfolio.output_summary_stats()
 
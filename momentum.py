@@ -0,0 +1,51 @@
+import numpy as np
+
+from strategy import CrossSectionalStrategy, cross_sectional_rank
+
+
+class MomentumRankStrategy(CrossSectionalStrategy):
+    """
+    Holds the top fraction of the universe ranked on momentum, the
+    return of the close over the last lookback bars. Every rebalance
+    bars the whole universe is ranked at once; the symbols entering
+    the top get a LONG signal and those leaving it an EXIT. Symbols
+    without lookback bars of history are not ranked.
+    """
+
+    def __init__(self, data, events, lookback=20, fraction=0.1, rebalance=5):
+        """
+        Parameters:
+        data - The DataHandler object providing get_cross_section().
+        events - The Event Queue object.
+        lookback - The number of bars momentum is measured over.
+        fraction - The share of the ranked symbols held.
+        rebalance - The number of bars between two rankings.
+        """
+        super().__init__(data, events, ('close',), lookback + 1)
+        self.lookback = lookback
+        self.fraction = fraction
+        self.rebalance = rebalance
+
+        self.held = np.zeros(len(self.symbol_list), dtype=bool)
+        self.bar_count = 0
+
+    def calculate_cross_section(self, bars):
+        self.bar_count += 1
+        close = bars['close']
+        if len(close) <= self.lookback or self.bar_count % self.rebalance:
+            return
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            momentum = close[-1] / close[0] - 1.0
+        ranks = cross_sectional_rank(momentum)
+        count = int(np.count_nonzero(~np.isnan(ranks)))
+        if count == 0:
+            return
+
+        # Ranks are order / (count - 1), so the top k start at count - k
+        k = max(1, int(round(self.fraction * count)))
+        target = ranks >= (count - k) / max(count - 1, 1)
+
+        self.put_signals(target & ~self.held, 'LONG')
+        self.put_signals(self.held & ~target, 'EXIT')
+        self.held = target
@@ -0,0 +1,298 @@
+import heapq
+
+from collections import deque
+
+
+class BookOrder(object):
+    # An order working in an OrderBook, its unfilled quantity and the
+    # side or queue of the book holding it
+    __slots__ = ('order', 'order_id', 'direction', 'price', 'remaining', 'side')
+
+    def __init__(self, order):
+        self.order = order
+        self.order_id = order.sequence
+        self.direction = order.direction
+        self.price = order.price
+        self.remaining = order.quantity
+        self.side = None
+
+
+class _BookSide(object):
+    """
+    The resting limit orders of one side of an OrderBook, or its buy or
+    sell stops, in a heap keyed on (sign * price, order id): the best
+    price, and within a price the earliest order, is on top, i.e.
+    price-time priority.
+
+    Inserts are one heap push and cancels are O(1): a cancelled order
+    stays in the heap until it reaches the top, where it is discarded.
+    Once cancelled orders make up most of the heap it is rebuilt from
+    the live ones, so memory stays proportional to the live orders
+    under any amount of cancel/replace.
+    """
+
+    def __init__(self, sign):
+        """
+        Parameters:
+        sign - -1 for bids (highest price best), 1 for asks (lowest price best);
+               1 for buy stops and -1 for sell stops (nearest stop first).
+        """
+        self.sign = sign
+        self.heap = []
+        # Number of live orders in the heap
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def add(self, entry):
+        heapq.heappush(self.heap, (self.sign * entry.price, entry.order_id, entry))
+        entry.side = self
+        self.live += 1
+
+    def remove(self, entry):
+        entry.remaining = 0
+        self.live -= 1
+        if len(self.heap) > 2 * self.live + 32:
+            self.heap = [item for item in self.heap if item[2].remaining]
+            heapq.heapify(self.heap)
+
+    def best(self):
+        """
+        Returns the best price with resting orders, or None.
+        """
+        heap = self.heap
+        while heap:
+            if heap[0][2].remaining:
+                return self.sign * heap[0][0]
+            heapq.heappop(heap)
+        return None
+
+    def pop(self, limit):
+        """
+        Removes and returns the live orders from the best price to the
+        limit (inclusive), in priority order.
+        """
+        heap = self.heap
+        bound = self.sign * limit
+        entries = []
+        while heap and heap[0][0] <= bound:
+            entry = heapq.heappop(heap)[2]
+            if entry.remaining > 0:
+                self.live -= 1
+                entries.append(entry)
+        return entries
+
+    def take(self, limit=None, quantity=None, orders=None):
+        """
+        Fills resting orders in price-time priority, from the best price
+        to the limit (inclusive), for up to quantity in total. None takes
+        every price or any quantity. Orders it completes are removed
+        from the orders dictionary, if given. Returns a list of (entry,
+        quantity).
+        """
+        heap = self.heap
+        heappop = heapq.heappop
+        bound = None if limit is None else self.sign * limit
+        fills = []
+        while heap and (quantity is None or quantity > 0):
+            key, order_id, entry = heap[0]
+            remaining = entry.remaining
+            if remaining == 0:
+                heappop(heap)
+                continue
+            if bound is not None and key > bound:
+                break
+            if quantity is None or remaining <= quantity:
+                filled = remaining
+                heappop(heap)
+                self.live -= 1
+                if orders is not None:
+                    del orders[order_id]
+            else:
+                filled = quantity
+            entry.remaining = remaining - filled
+            if quantity is not None:
+                quantity -= filled
+            fills.append((entry, filled))
+        return fills
+
+
+class _MarketQueue(object):
+    """
+    The market orders (including triggered stops) of one direction of
+    an OrderBook waiting for liquidity, in arrival order. Cancels are
+    O(1) and purged like those of a _BookSide.
+    """
+
+    def __init__(self):
+        self.queue = deque()
+        # Number of live orders in the queue
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def add(self, entry):
+        self.queue.append(entry)
+        entry.side = self
+        self.live += 1
+
+    def remove(self, entry):
+        entry.remaining = 0
+        self.live -= 1
+        if len(self.queue) > 2 * self.live + 32:
+            self.queue = deque(entry for entry in self.queue if entry.remaining)
+
+    def take(self, quantity=None, orders=None):
+        """
+        Fills waiting orders in arrival order, up to quantity (None for
+        any). Orders it completes are removed from the orders dictionary,
+        if given. Returns a list of (entry, quantity).
+        """
+        queue = self.queue
+        fills = []
+        while queue and (quantity is None or quantity > 0):
+            entry = queue[0]
+            remaining = entry.remaining
+            if remaining == 0:
+                queue.popleft()
+                continue
+            if quantity is None or remaining <= quantity:
+                filled = remaining
+                queue.popleft()
+                self.live -= 1
+                if orders is not None:
+                    del orders[entry.order_id]
+            else:
+                filled = quantity
+            entry.remaining = remaining - filled
+            if quantity is not None:
+                quantity -= filled
+            fills.append((entry, filled))
+        return fills
+
+
+class OrderBook(object):
+    """
+    OrderBook holds the working orders of one symbol: resting limit
+    orders on a bid and an ask side in price-time priority, stop orders
+    in heaps keyed on their stop price, and market orders (including
+    triggered stops) waiting for liquidity in arrival order.
+
+    Orders are identified by the sequence of their OrderEvent. Insert
+    is O(log n) in the number of working orders, cancel is O(1), and
+    every heap and queue purges its cancelled orders once they make up
+    most of it.
+    """
+
+    def __init__(self, symbol):
+        """
+        Parameters:
+        symbol - The symbol of the orders.
+        """
+        self.symbol = symbol
+        self.bids = _BookSide(-1)
+        self.asks = _BookSide(1)
+        self.buy_stops = _BookSide(1)
+        self.sell_stops = _BookSide(-1)
+        self.market = {'BUY': _MarketQueue(), 'SELL': _MarketQueue()}
+        # Working orders by order id
+        self.orders = {}
+
+    def __len__(self):
+        return len(self.orders)
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def _side(self, direction):
+        return self.bids if direction == 'BUY' else self.asks
+
+    def add_limit(self, entry):
+        self.orders[entry.order_id] = entry
+        (self.bids if entry.direction == 'BUY' else self.asks).add(entry)
+
+    def add_stop(self, entry):
+        self.orders[entry.order_id] = entry
+        (self.buy_stops if entry.direction == 'BUY' else self.sell_stops).add(entry)
+
+    def add_market(self, entry):
+        self.orders[entry.order_id] = entry
+        self.market[entry.direction].add(entry)
+
+    def cancel(self, order_id):
+        """
+        Cancels a working order. Returns the quantity it had left, or
+        None if it is not working.
+        """
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return None
+        remaining = entry.remaining
+        entry.side.remove(entry)
+        return remaining
+
+    def crosses(self, direction, limit=None):
+        """
+        Returns whether an incoming order of direction with the limit
+        price (None for a market order) would match a resting order.
+        """
+        side = self.asks if direction == 'BUY' else self.bids
+        if not side.live:
+            return False
+        best = side.best()
+        return limit is None or side.sign * best <= side.sign * limit
+
+    def match(self, direction, limit=None, quantity=None):
+        """
+        Fills resting limit orders against an incoming order of direction
+        up to the limit price (None for a market order) and quantity.
+        Returns a list of (resting entry, quantity), priced at the
+        resting order's price.
+        """
+        side = self.asks if direction == 'BUY' else self.bids
+        return side.take(limit, quantity, self.orders)
+
+    def cancel_crossing(self, direction, limit=None, quantity=None):
+        """
+        Cancels the resting limit orders an incoming order of direction
+        with the limit price (None for a market order) would match, in
+        priority order until they cover quantity (None for all of them).
+        Returns a list of (entry, quantity it had left).
+        """
+        side = self.asks if direction == 'BUY' else self.bids
+        cancelled = side.take(limit, quantity, self.orders)
+        if cancelled:
+            entry, taken = cancelled[-1]
+            if entry.remaining > 0:
+                cancelled[-1] = (entry, taken + self.cancel(entry.order_id))
+        return cancelled
+
+    def cross(self, direction, price, quantity=None):
+        """
+        Fills the resting limit orders of direction that a market trading
+        at price would reach (bids at or above, asks at or below it), up
+        to quantity. Returns a list of (entry, quantity).
+        """
+        return self._side(direction).take(price, quantity, self.orders)
+
+    def triggered(self, low, high):
+        """
+        Moves the stop orders a bar ranging from low to high triggers to
+        the market queues, in stop price order. Returns the triggered entries.
+        """
+        entries = self.buy_stops.pop(high) + self.sell_stops.pop(low)
+        for entry in entries:
+            self.market[entry.direction].add(entry)
+        return entries
+
+    def fill_market(self, direction, quantity=None):
+        """
+        Fills waiting market orders of direction in arrival order, up to
+        quantity. Returns a list of (entry, quantity).
+        """
+        return self.market[direction].take(quantity, self.orders)
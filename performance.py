@@ -22,3 +22,91 @@ def create_drawdowns(equity_curve):
     duration = abs(equity_curve['equity_curve'].argmax() - equity_curve['equity_curve'].argmin())
     
     return max_drawdown, duration
+
+class OnlineMetrics(object):
+    """
+    OnlineMetrics accumulates the headline performance statistics of
+    an equity series one observation at a time, in O(1) per bar, so a
+    live snapshot is available at any point of a run without rebuilding
+    the equity curve.
+
+    Returns are the period percentage changes of the portfolio total.
+    Their mean and variance are tracked with Welford's algorithm; the
+    variance uses ddof=0, as create_sharpe_ratio does via np.std.
+
+    Drawdowns are peak-to-trough: the fall of the equity curve from
+    its running peak, and the number of bars spent below that peak.
+    create_drawdowns measures something else (the range of the whole
+    curve and the bars between its maximum and minimum), so the
+    snapshot keys are named apart from those of output_summary_stats.
+    """
+
+    def __init__(self, initial_equity, periods=252):
+        """
+        Parameters:
+        initial_equity - The starting value of the portfolio.
+        periods - daily (252), hourly (252*6.5), minutely (252*6.5*60)
+        """
+        self.initial_equity = initial_equity
+        self.periods = periods
+
+        self.last_equity = initial_equity
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+        self.peak = 1.0
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.duration = 0
+        self.max_duration = 0
+
+    def update(self, equity):
+        """
+        Adds the next value of the portfolio total.
+        """
+        if self.last_equity != 0:
+            ret = equity / self.last_equity - 1.0
+            self.count += 1
+            delta = ret - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (ret - self.mean)
+        self.last_equity = equity
+
+        # Drawdowns are measured on the equity curve, i.e. equity / initial
+        curve = equity / self.initial_equity
+        if curve >= self.peak:
+            self.peak = curve
+            self.drawdown = 0.0
+            self.duration = 0
+        else:
+            self.drawdown = self.peak - curve
+            self.duration += 1
+            self.max_drawdown = max(self.max_drawdown, self.drawdown)
+            self.max_duration = max(self.max_duration, self.duration)
+
+    @property
+    def total_return(self):
+        return self.last_equity / self.initial_equity - 1.0
+
+    @property
+    def sharpe_ratio(self):
+        if self.count == 0 or self._m2 <= 0:
+            return np.nan
+        return float(np.sqrt(self.periods) * self.mean / np.sqrt(self._m2 / self.count))
+
+    def snapshot(self):
+        """
+        Returns the current statistics as a dictionary: the drawdown in
+        progress and the largest one so far, and the bars spent below
+        the peak now and at most.
+        """
+        return {
+            'Total Return': self.total_return * 100,
+            'Sharpe Ratio': self.sharpe_ratio,
+            'Peak Equity': self.peak * self.initial_equity,
+            'Peak-to-Trough Drawdown': self.drawdown,
+            'Max Peak-to-Trough Drawdown': self.max_drawdown,
+            'Underwater Duration': self.duration,
+            'Max Underwater Duration': self.max_duration,
+        }
@@ -8,7 +8,58 @@ from math import floor
 
 from event import FillEvent, OrderEvent, SignalEvent
 
-from performance import create_sharpe_ratio, create_drawdowns
+from history import History
+from ledger import TradeLedger
+from performance import create_sharpe_ratio, create_drawdowns, OnlineMetrics
+
+
+def _history_records(history):
+    """
+    Lays a History out as the list of dictionaries the portfolio
+    used to keep: the initial row keyed on 'datestamp' and every
+    later row on 'datetime'.
+    """
+    values = history.values.tolist()
+    datetimes = history.datetimes
+    return [
+        dict(zip(history.columns, row), **{'datestamp' if i == 0 else 'datetime': datetimes[i]})
+        for i, row in enumerate(values)
+    ]
+
+
+def create_equity_curve_frame(datetimes, holdings, symbol_list):
+    """
+    Builds the equity curve DataFrame from a time x column holdings
+    matrix (symbols, then cash, commission and total), whose first
+    row is the initial holdings at the start date.
+
+    The layout is the one the portfolio has always produced: indexed
+    on 'datestamp', which only the initial row carries, with the bar
+    time of every later row in a 'datetime' column, followed by the
+    period returns and the equity curve.
+
+    Parameters:
+    datetimes - Sequence of row datetimes, the first being the start date.
+    holdings - The time x (symbols + cash, commission, total) matrix.
+    symbol_list - A list of symbol strings.
+    """
+    n = len(datetimes)
+    columns = {s: holdings[:, i] for i, s in enumerate(symbol_list)}
+    columns['datestamp'] = np.array([datetimes[0]] + [np.nan] * (n - 1), dtype=object)
+    for i, name in enumerate(['cash', 'commission', 'total']):
+        columns[name] = holdings[:, len(symbol_list) + i]
+    columns['datetime'] = np.array([np.nan] + list(datetimes[1:]), dtype=object)
+
+    curve = pd.DataFrame(columns)
+    curve.set_index('datestamp', inplace = True)
+
+    #creates a new column which calculates the % change/100 from one datestamp to the next
+    curve['returns'] = curve['total'].pct_change()
+
+    #creates a new column which calculates the scaling from the initial captial to the total for each datestamp
+    curve['equity_curve'] = (1.0 + curve['returns']).cumprod()
+
+    return curve
 
 class Portfolio(object):
     """
@@ -35,6 +86,14 @@ class Portfolio(object):
         """
         raise NotImplementedError("Should implement update_fill()")
 
+    def update_cancel(self, event):
+        """
+        Acts on a CancelEvent reporting a working order the broker
+        cancelled. Portfolios not tracking their working orders
+        can ignore it.
+        """
+        pass
+
 class NaivePortfolio(Portfolio):
     """
     The NaivePortfolio object is designed to send orders to
@@ -43,17 +102,25 @@ class NaivePortfolio(Portfolio):
     used to test simpler strategies such as BuyAndHoldStrategy.
     """
     
-    def __init__(self, data, events, start_date, symbolList, initial_capital=100000.0):
+    def __init__(self, data, events, start_date, symbolList, initial_capital=100000.0,
+                 price_field=None):
         """
         Initialises the portfolio with bars and an event queue. 
         Also includes a starting datetime index and initial capital 
         (USD unless otherwise stated).
 
+        Positions and the latest prices are kept as NumPy vectors
+        aligned with the symbol list, so marking to market is one
+        vector product per bar and pricing a fill one array lookup.
+
         Parameters:
         data - The DataHandler object with current market data.
         events - The Event Queue object.
         start_date - The start date (bar) of the portfolio.
         initial_capital - The starting capital in USD.
+        price_field - The bar field positions are marked and filled at,
+                      defaults to the second field of the data handler
+                      (bar tuple index 3, 'high' for OHLCV bars).
         """
         self.events = events
         self.data = data
@@ -63,33 +130,59 @@ class NaivePortfolio(Portfolio):
         self.symbolList = symbolList
         self.symbol_list = self.symbolList
 
-        self.all_positions = self.construct_all_positions()
+        self.positions_history = self.construct_all_positions()
         self.current_positions = {symbol: 0 for symbol in self.symbol_list}
-
-        self.all_holdings = self.construct_all_holdings()
+        # Signed quantity of the orders sent but not yet filled, per symbol
+        self.working_quantity = {symbol: 0 for symbol in self.symbol_list}
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbol_list)}
+        self.positions = np.zeros(len(self.symbol_list))
+        self.price_field = price_field
+        self.prices = None
+        self._all_started = False
+        # Holdings row of the current bar: market values, cash, commission, total
+        self._holdings_row = np.zeros(len(self.symbol_list) + 3)
+
+        self.holdings_history = self.construct_all_holdings()
         self.current_holdings = self.construct_current_holdings()
+
+        self.metrics = OnlineMetrics(self.initial_capital)
+        self.ledger = TradeLedger(self.symbol_list)
     
     def construct_all_positions(self):
         """
-        Constructs the positions list using the start_date
-        to determine when the time index will begin.
+        Constructs the positions history (time x symbol) using the
+        start_date to determine when the time index will begin.
         """
-        positions = {symbol: 0 for symbol in self.symbol_list}
-        positions['datestamp'] = self.start_date
-        return [positions]
+        positions = History(self.symbol_list)
+        positions.append(self.start_date, [0] * len(self.symbol_list))
+        return positions
 
     def construct_all_holdings(self):
         """
-        Constructs the holdings list using the start_date
-        to determine when the time index will begin.
+        Constructs the holdings history (time x symbol, plus cash,
+        commission and total) using the start_date to determine
+        when the time index will begin.
         """
+        holdings = History(self.symbol_list + ['cash', 'commission', 'total'])
+        holdings.append(
+            self.start_date,
+            [0] * len(self.symbol_list) + [self.initial_capital, 0, self.initial_capital]
+        )
+        return holdings
 
-        holdings = {symbol: 0 for symbol in self.symbol_list}
-        holdings['datestamp'] = self.start_date
-        holdings['cash'] = self.initial_capital
-        holdings['commission'] = 0
-        holdings['total'] = self.initial_capital
-        return [holdings]
+    @property
+    def all_positions(self):
+        """
+        The positions history as a list of dictionaries, one per bar.
+        """
+        return _history_records(self.positions_history)
+
+    @property
+    def all_holdings(self):
+        """
+        The holdings history as a list of dictionaries, one per bar.
+        """
+        return _history_records(self.holdings_history)
 
     def construct_current_holdings(self):
         """
@@ -102,6 +195,18 @@ class NaivePortfolio(Portfolio):
         holdings['total'] = self.initial_capital
         return holdings
 
+    def latest_prices(self):
+        """
+        Returns the vector of the latest price_field value of every
+        symbol, in symbol list order (NaN before a symbol's first bar).
+        It is the data handler's cross-section, updated in place.
+        """
+        if self.prices is None:
+            if self.price_field is None:
+                self.price_field = self.data.fields[1]
+            self.prices = self.data.get_cross_section(self.price_field)
+        return self.prices
+
     def update_timeindex(self, event):
         """
         Adds a new record to the positions matrix for the current
@@ -109,46 +214,40 @@ class NaivePortfolio(Portfolio):
         current market data at this stage is known (OHLCV).
         Makes use of a MarketEvent from the events queue.
         """
-        
-        data = {s: self.data.get_latest_bars(s) for s in self.symbol_list}
-        
-        datestamp = data[self.symbol_list[0]][0][1]  #newest datestamp
+        prices = self.latest_prices()
+
+        #newest datestamp across the symbols that have started trading
+        if self.data.updated_symbols:
+            datestamp = self.data.get_latest_bar_datetime(self.data.updated_symbols[0])
+        else:
+            datestamp = max(
+                bars[0][1] for bars in
+                (self.data.get_latest_bars(s) for s in self.symbol_list) if bars
+            )
 
-       
         # Update positions
         # ================
-        # Dictionary comprehension list with all symbol keys updated by current_positions values
-        positions = {symbol: self.current_positions[symbol] for symbol in self.symbol_list}
-        positions["datetime"] = datestamp
-        # Append the current positions
-        self.all_positions.append(positions)
+        self.positions_history.append(datestamp, self.positions)
 
         # Update holdings
         # ===============
-        holdings = {symbol: 0.0 for symbol in self.symbol_list}
-        holdings["datetime"] = datestamp
-        holdings["cash"] = self.current_holdings["cash"]
-        holdings["commission"] = self.current_holdings["commission"]
-        holdings["total"] = self.current_holdings["cash"]
-
-        # Update market value and pnl for all symbols
-        # ==============
-        for symbol in self.symbol_list:
-            # Approximation to the real value --> market_value = adj close price * position_size
-            market_value = self.current_positions[symbol] * data[symbol][0][3]
-            holdings[symbol] = market_value
-
-            # print(symbol,holdings[symbol])
-            
-            
-            holdings["total"] += market_value
+        # Approximation to the real value --> market_value = price * position_size,
+        # with no value for the symbols that have not started trading
+        n = len(self.symbol_list)
+        holdings = self._holdings_row
+        market_values = np.multiply(self.positions, prices, out=holdings[:n])
+        if not self._all_started:
+            if np.isnan(prices).any():
+                np.nan_to_num(market_values, copy=False)
+            else:
+                self._all_started = True
+
+        cash = self.current_holdings["cash"]
+        total = cash + float(market_values.sum())
+        holdings[n:] = (cash, self.current_holdings["commission"], total)
+        self.holdings_history.append(datestamp, holdings)
+        self.metrics.update(total)
 
-        # Append the current holdings
-        
-        self.all_holdings.append(holdings)
-
-        
-    
     def update_positions_from_fill(self, event):
         
         #Takes a FillEvent from the broker and updates current_positions dictionary by
@@ -163,12 +262,14 @@ class NaivePortfolio(Portfolio):
             fill_dir = -1
             
         self.current_positions[event.symbol] += fill_dir * event.quantity
+        self.working_quantity[event.symbol] -= fill_dir * event.quantity
+        self.positions[self.symbol_index[event.symbol]] += fill_dir * event.quantity
     
     def update_holdings_from_fill(self, event):
         #Takes a FillEvent from the broker and updates current_holdings dictionary by
         #adding/subtracting the correct cost
-        #In reality a broker would give us the event.fill_cost - the price at which the trade was made
-        #We will assume that the fill cost is the current adj. close price
+        #A broker simulating prices gives us the event.fill_cost - the price at which the trade was made
+        #Otherwise we will assume that the fill cost is the latest price of the symbol
         
         #Check whether the fill was a buy or sell
         fill_dir = 0
@@ -178,12 +279,18 @@ class NaivePortfolio(Portfolio):
         else:
             fill_dir = -1
             
-        fill_cost = self.data.get_latest_bars(event.symbol)[0][3]
+        fill_cost = event.fill_cost
+        if fill_cost is None:
+            fill_cost = float(self.latest_prices()[self.symbol_index[event.symbol]])
         cost = fill_dir*fill_cost*event.quantity
         self.current_holdings[event.symbol] += cost   
-        self.current_holdings['commission'] += event.commision
-        self.current_holdings['cash'] -= (cost + event.commision)
-        self.current_holdings['total'] -= (cost + event.commision)
+        self.current_holdings['commission'] += event.commission
+        self.current_holdings['cash'] -= (cost + event.commission)
+        self.current_holdings['total'] -= (cost + event.commission)
+
+        # Every fill is kept in the trade ledger, timed at its bar
+        self.ledger.record(self.data.get_latest_bar_datetime(event.symbol), event.symbol,
+                           fill_dir, event.quantity, fill_cost, event.commission)
     
     def update_fill(self, event):
         """
@@ -194,32 +301,69 @@ class NaivePortfolio(Portfolio):
             self.update_positions_from_fill(event)
             self.update_holdings_from_fill(event)
 
+    def update_cancel(self, event):
+        """
+        Removes the unfilled quantity of a cancelled order from the
+        working quantity, so later orders are sized without it.
+        """
+        if event.type == 'CANCEL':
+            if event.direction == 'BUY':
+                self.working_quantity[event.symbol] -= event.quantity
+            else:
+                self.working_quantity[event.symbol] += event.quantity
+
+    @staticmethod
+    def naive_order_size(direction, current_quantity, strength=1):
+        """
+        The constant quantity sizing rule behind generate_naive_order,
+        shared with the vectorized engine. Returns a tuple of
+        (quantity, 'BUY' or 'SELL'), or None if no order is needed.
+
+        Parameters:
+        direction - The signal type, 'LONG', 'SHORT' or 'EXIT'.
+        current_quantity - The current position in the symbol.
+        strength - Scaling factor of the constant quantity.
+        """
+        mkt_quantity = floor(100 * strength)
+
+        if direction == "LONG" and current_quantity == 0:
+            return mkt_quantity, "BUY"
+        if direction == "SHORT" and current_quantity == 0:
+            return mkt_quantity, "SELL"
+
+        if direction == "EXIT" and current_quantity > 0:
+            return abs(current_quantity), "SELL"
+        if direction == "EXIT" and current_quantity < 0:
+            return abs(current_quantity), "BUY"
+
+        return None
+
     def generate_naive_order(self, signal):
         """
         Simply files an Order object as a constant quantity
-        sizing of the signal object
+        sizing of the signal object.
+
+        Orders are sized against the position plus the quantity still
+        working at the broker, so that e.g. an EXIT arriving while the
+        entry order waits out its latency closes the entry as well.
         Parameters:
         signal - The tuple containing Signal information.
         """
         order = None
         symbol = signal.symbol
-        direction = signal.signal_type
         # strength = signal.strength
         strength = 1
 
-        mkt_quantity = floor(100 * strength)
-        current_quantity = self.current_positions[symbol]
         order_type = "MKT"
-
-        if direction == "LONG" and current_quantity == 0:
-            order = OrderEvent(symbol, order_type, mkt_quantity, "BUY")
-        if direction == "SHORT" and current_quantity == 0:
-            order = OrderEvent(symbol, order_type, mkt_quantity, "SELL")
-
-        if direction == "EXIT" and current_quantity > 0:
-            order = OrderEvent(symbol, order_type, abs(current_quantity), "SELL")
-        if direction == "EXIT" and current_quantity < 0:
-            order = OrderEvent(symbol, order_type, abs(current_quantity), "BUY")
+        size = self.naive_order_size(
+            signal.signal_type,
+            self.current_positions[symbol] + self.working_quantity[symbol],
+            strength
+        )
+        if size is not None:
+            quantity, direction = size
+            order = OrderEvent(symbol, order_type, quantity, direction)
+            self.working_quantity[symbol] += quantity if direction == 'BUY' else -quantity
 
         return order
 
@@ -232,26 +376,37 @@ class NaivePortfolio(Portfolio):
                 self.events.put(order)
 
     def create_equity_curve(self):
-        #creates a dataframe from the all_holdings list of dictionaries
+        #creates a dataframe from the columnar holdings history
 
-        curve = pd.DataFrame(self.all_holdings)
-        curve.set_index('datestamp', inplace = True)
-        
-        #creates a new column which calculates the % change/100 from one datestamp to the next
-        curve['returns'] = curve['total'].pct_change()
-        
-        #creates a new column which calculates the scaling from the initial captial to the total for each datestamp
-        curve['equity_curve'] = (1.0 + curve['returns']).cumprod()
+        holdings = self.holdings_history
+        return create_equity_curve_frame(
+            holdings.datetimes, holdings.values, self.symbol_list
+        )
 
-        return curve
+    def live_stats(self):
+        """
+        Returns a cheap snapshot of the running performance statistics
+        (total return, Sharpe ratio, peak equity, current and maximum
+        peak-to-trough drawdown and time under water), updated in O(1)
+        per bar by update_timeindex.
+
+        Unlike output_summary_stats() this neither rebuilds the equity
+        curve nor writes equity.csv, so it can be called on every bar.
+        Its drawdowns are not those of output_summary_stats(), see
+        OnlineMetrics.
+        """
+        return self.metrics.snapshot()
 
-    def output_summary_stats(self):
+    def output_summary_stats(self, filename="equity.csv"):
         
         
         #Returns a list of tuples
+        #filename - where the equity curve is written, None to skip writing it
+        #Rebuilds the full equity curve and writes equity.csv, so it is
+        #meant to be called once at the end of a run (see live_stats)
         
         self.equity_curve = self.create_equity_curve()
-        total_return = self.equity_curve['equity_curve'][-1]
+        total_return = self.equity_curve['equity_curve'].iloc[-1]
         returns = self.equity_curve['returns']
 
         equity_curve = self.equity_curve['equity_curve']
@@ -266,6 +421,7 @@ class NaivePortfolio(Portfolio):
                 ('Max Drawdown', '{}'.format(max_drawdown)),
                 ('Drawdown Duration', '{}'.format(duration))]
 
-        self.equity_curve.to_csv("equity.csv")
+        if filename is not None:
+            self.equity_curve.to_csv(filename)
         
         return stats
\ No newline at end of file
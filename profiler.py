@@ -0,0 +1,205 @@
+import json
+import time
+
+from array import array
+
+import numpy as np
+
+# Histogram bins of the latencies: logarithmic, BINS_PER_DECADE per
+# decade from 1 ns to 1000 s, i.e. percentiles within about 1%
+BINS_PER_DECADE = 100
+_EDGES = np.logspace(-9, 3, 12 * BINS_PER_DECADE + 1)
+
+
+class _Latencies(object):
+    """
+    The latencies of one timed handler in fixed memory: exact calls,
+    total and maximum, and a histogram for the percentiles. New samples
+    are appended to a buffer of up to `buffer` values, which is folded
+    into the histogram with one vectorized pass once full.
+    """
+
+    def __init__(self, buffer=4096):
+        self.size = buffer
+        self.buffer = array('d')
+        self.counts = np.zeros(len(_EDGES) + 1, dtype=np.int64)
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def flush(self):
+        if not self.buffer:
+            return
+        values = np.array(self.buffer, dtype=np.float64)
+        del self.buffer[:]
+        self.calls += len(values)
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+        self.counts += np.bincount(
+            np.searchsorted(_EDGES, values, side='right'), minlength=len(self.counts)
+        )
+
+    def percentiles(self, qs):
+        """
+        Returns the latencies at the percentiles qs, each taken as the
+        geometric middle of its histogram bin (capped at the maximum).
+        """
+        self.flush()
+        if self.calls == 0:
+            return [0.0] * len(qs)
+        cumulative = np.cumsum(self.counts)
+        result = []
+        for q in qs:
+            i = int(np.searchsorted(cumulative, max(q / 100.0 * self.calls, 1)))
+            if i == 0:
+                value = _EDGES[0]
+            elif i == len(_EDGES):
+                value = self.max
+            else:
+                value = np.sqrt(_EDGES[i - 1] * _EDGES[i])
+            result.append(min(float(value), self.max))
+        return result
+
+
+class LoopProfiler(object):
+    """
+    LoopProfiler records the latency of every call made by the event
+    loop into the components: DataHandler.update_bars and each handler
+    subscribed on the EventBus (Strategy.calculate_signals, the
+    Portfolio and ExecutionHandler methods), keyed on the component,
+    the handler and the event type it handles.
+
+    The handlers are wrapped when Backtest subscribes them, so any
+    Strategy, Portfolio or ExecutionHandler subclass is timed without
+    changes. Instrumentation is opt-in: a Backtest created without a
+    profiler subscribes the bare handlers and pays nothing.
+
+    Calls, total and maximum latency are exact; the percentiles come
+    from a histogram with logarithmic bins, within about 1%, so the
+    memory per handler is fixed whatever the length of the run.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Parameters:
+        clock - Callable returning the current time in seconds.
+        """
+        self.clock = clock
+        # _Latencies per (component, handler name, event_type)
+        self.latencies = {}
+        self.elapsed = 0.0
+        self._started = None
+
+    def wrap(self, component, handler, event_type=None):
+        """
+        Returns handler wrapped to record the latency of each call
+        under (component, handler name, event_type).
+        """
+        key = (component, handler.__name__, event_type)
+        latencies = self.latencies.setdefault(key, _Latencies())
+        buffer = latencies.buffer
+        append = buffer.append
+        size = latencies.size
+        clock = self.clock
+
+        def timed(*args):
+            start = clock()
+            result = handler(*args)
+            append(clock() - start)
+            if len(buffer) >= size:
+                latencies.flush()
+            return result
+
+        timed.__wrapped__ = handler
+        return timed
+
+    def start(self):
+        """
+        Starts timing the run; the time between start() and stop()
+        not spent in a timed handler is reported as loop dispatch.
+        """
+        self._started = self.clock()
+
+    def stop(self):
+        self.elapsed += self.clock() - self._started
+
+    def records(self):
+        """
+        Returns one dictionary per timed handler: its calls, total
+        seconds, share of the run and mean/percentile latencies in
+        microseconds. A final record attributes the rest of the run
+        time to the loop itself (event dispatch).
+        """
+        records = []
+        measured = 0.0
+        for (component, handler, event_type), latencies in self.latencies.items():
+            p50, p90, p99 = latencies.percentiles([50, 90, 99])
+            total = latencies.total
+            measured += total
+            records.append({
+                'component': component,
+                'handler': handler,
+                'event': event_type,
+                'calls': latencies.calls,
+                'total_s': total,
+                'share': total / self.elapsed if self.elapsed > 0 else float('nan'),
+                'mean_us': total / max(latencies.calls, 1) * 1e6,
+                'p50_us': p50 * 1e6,
+                'p90_us': p90 * 1e6,
+                'p99_us': p99 * 1e6,
+                'max_us': latencies.max * 1e6,
+            })
+        if self.elapsed > 0:
+            rest = max(self.elapsed - measured, 0.0)
+            records.append({
+                'component': 'loop', 'handler': 'dispatch', 'event': None,
+                'calls': None, 'total_s': rest, 'share': rest / self.elapsed,
+                'mean_us': None, 'p50_us': None, 'p90_us': None, 'p99_us': None,
+                'max_us': None,
+            })
+        return records
+
+    def event_totals(self):
+        """
+        Returns the total seconds spent in the handlers of each event type.
+        """
+        totals = {}
+        for (_, _, event_type), latencies in self.latencies.items():
+            if event_type is not None:
+                latencies.flush()
+                totals[event_type] = totals.get(event_type, 0.0) + latencies.total
+        return totals
+
+    def report(self):
+        """
+        Returns the summary table of the run as a string.
+        """
+        def number(value, fmt):
+            return '-' if value is None else fmt % value
+
+        lines = ["%-10s %-20s %-7s %9s %10s %6s %10s %10s %10s %10s %10s" % (
+            'component', 'handler', 'event', 'calls', 'total s', 'share',
+            'mean us', 'p50 us', 'p90 us', 'p99 us', 'max us')]
+        for r in self.records():
+            lines.append("%-10s %-20s %-7s %9s %10.4f %5.1f%% %10s %10s %10s %10s %10s" % (
+                r['component'], r['handler'], r['event'] or '-',
+                number(r['calls'], '%d'), r['total_s'], 100.0 * r['share'],
+                number(r['mean_us'], '%.2f'), number(r['p50_us'], '%.2f'),
+                number(r['p90_us'], '%.2f'), number(r['p99_us'], '%.2f'),
+                number(r['max_us'], '%.2f')))
+        lines.append("")
+        lines.append("Time per event type: " + ", ".join(
+            "%s %.4f s" % item for item in self.event_totals().items()))
+        lines.append("Run time: %.4f s" % self.elapsed)
+        return "\n".join(lines)
+
+    def dump(self, filename):
+        """
+        Writes the run time, per-event totals and records to a JSON file.
+        """
+        with open(filename, 'w') as f:
+            json.dump({
+                'elapsed_s': self.elapsed,
+                'events': self.event_totals(),
+                'records': self.records(),
+            }, f, indent=2)
@@ -0,0 +1,185 @@
+import inspect
+
+from indicators import ATR, EMA, SMA, RollingMax, RollingMin, RollingStd, Window, ZScore
+
+# Indicator name -> (factory, inputs), see register_indicator()
+INDICATORS = {}
+
+
+def register_indicator(name, factory, inputs):
+    """
+    Makes an indicator available to every IndicatorRegistry under name.
+
+    Parameters:
+    name - The indicator name, e.g. 'SMA'.
+    factory - Callable of the indicator parameters returning a new Indicator.
+    inputs - Callable of the same parameters returning the sources fed
+             to the indicator's update(), in order: bar field names, or
+             (name, *params) tuples of other indicators.
+    """
+    INDICATORS[name] = (factory, inputs)
+
+
+def _series_indicator(cls):
+    # (factory, inputs) of a single-series indicator of (period, source)
+    def factory(period, source='close'):
+        return cls(period)
+
+    def inputs(period, source='close'):
+        return [source]
+    return factory, inputs
+
+
+for _name, _cls in (('SMA', SMA), ('EMA', EMA), ('STD', RollingStd), ('MAX', RollingMax),
+                    ('MIN', RollingMin), ('WINDOW', Window)):
+    register_indicator(_name, *_series_indicator(_cls))
+
+register_indicator('ATR', ATR, lambda period: ['high', 'low', 'close'])
+register_indicator(
+    'ZSCORE',
+    lambda period, source='close': ZScore(),
+    lambda period, source='close': [source, ('SMA', period, source), ('STD', period, source)],
+)
+
+
+class _Entry(object):
+    # A shared indicator, its resolved sources and its reference count
+    __slots__ = ('key', 'indicator', 'sources', 'refs')
+
+    def __init__(self, key, indicator, sources):
+        self.key = key
+        self.indicator = indicator
+        self.sources = sources
+        self.refs = 0
+
+
+class IndicatorRegistry(object):
+    """
+    IndicatorRegistry shares streaming indicators between strategies.
+    Each indicator is keyed on (symbol, name, params), computed once
+    per new bar of its symbol and served to every strategy that
+    acquired it, so strategies run side by side do not recompute the
+    same series.
+
+    Indicators may take other indicators as sources, e.g.
+    ('WINDOW', 4, ('SMA', 44)) keeps the last four values of an SMA.
+    Sources are acquired along with the indicator and always updated
+    before it; an indicator is only fed once all its sources are ready.
+    Every entry is reference counted and evicted, with its sources,
+    once no strategy (or other indicator) holds it any more.
+
+    Strategies call refresh() at the start of calculate_signals(); the
+    first call of a bar feeds the bar to the indicators, later calls
+    are free. An indicator acquired mid-run is fed from then on.
+    """
+
+    def __init__(self, data):
+        """
+        Parameters:
+        data - The DataHandler object providing the bars.
+        """
+        self.data = data
+        self.entries = {}
+        # Entries of every symbol in dependency order
+        self.symbol_entries = {}
+        # Datetime of the latest bar fed, per symbol
+        self.latest_datetime = {}
+        self._now = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _canonical(self, name, params):
+        # Fills in the default parameters, recursively for indicator sources
+        if name not in INDICATORS:
+            raise KeyError("Unknown indicator: %s" % name)
+        bound = inspect.signature(INDICATORS[name][1]).bind(*params)
+        bound.apply_defaults()
+        return tuple(
+            (p[0],) + self._canonical(p[0], p[1:])
+            if isinstance(p, tuple) and p and p[0] in INDICATORS else p
+            for p in bound.args
+        )
+
+    def _acquire(self, symbol, name, params):
+        key = (symbol, name, self._canonical(name, params))
+        entry = self.entries.get(key)
+        if entry is None:
+            factory, inputs = INDICATORS[name]
+            sources = [
+                source if isinstance(source, str) else self._acquire(symbol, source[0], source[1:])
+                for source in inputs(*key[2])
+            ]
+            entry = self.entries[key] = _Entry(key, factory(*key[2]), sources)
+            self.symbol_entries.setdefault(symbol, {})[key] = entry
+        entry.refs += 1
+        return entry
+
+    def _release(self, entry):
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+        symbol = entry.key[0]
+        del self.entries[entry.key]
+        del self.symbol_entries[symbol][entry.key]
+        if not self.symbol_entries[symbol]:
+            del self.symbol_entries[symbol]
+            self.latest_datetime.pop(symbol, None)
+        for source in entry.sources:
+            if not isinstance(source, str):
+                self._release(source)
+
+    def acquire(self, symbol, name, *params):
+        """
+        Returns the shared indicator name(*params) of the symbol,
+        creating it on first use. Read its value and ready attributes
+        after refresh(); release() it when no longer needed.
+        """
+        return self._acquire(symbol, name, params).indicator
+
+    def release(self, symbol, name, *params):
+        """
+        Drops one reference to an acquired indicator, evicting it and
+        its unreferenced sources once nothing holds it.
+        """
+        self._release(self.entries[(symbol, name, self._canonical(name, params))])
+
+    def value(self, symbol, name, *params):
+        """
+        Returns the latest value of an acquired indicator.
+        """
+        return self.entries[(symbol, name, self._canonical(name, params))].indicator.value
+
+    def refresh(self):
+        """
+        Feeds the latest bar of every symbol with a new bar since the
+        last call to its indicators, in dependency order.
+        """
+        now = self.data.current_datetime
+        # Identity first: comparing datetime64 values is comparatively slow
+        if now is self._now or now == self._now:
+            return
+        self._now = now
+
+        get_value = self.data.get_latest_bar_value
+        for symbol, entries in self.symbol_entries.items():
+            bar_date = get_value(symbol, 'datetime')
+            if bar_date is None or bar_date == self.latest_datetime.get(symbol):
+                continue
+            self.latest_datetime[symbol] = bar_date
+
+            fields = {}
+            for entry in entries.values():
+                args = []
+                for source in entry.sources:
+                    if isinstance(source, str):
+                        if source not in fields:
+                            fields[source] = get_value(symbol, source)
+                        value = fields[source]
+                    else:
+                        value = source.indicator.value
+                    if value is None:
+                        break
+                    args.append(value)
+                else:
+                    entry.indicator.update(*args)
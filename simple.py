@@ -2,13 +2,34 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from event import SignalEvent
+from registry import IndicatorRegistry
 from strategy import Strategy
 import warnings
 
 warnings.filterwarnings("ignore")
 
 class MovingAverageCrossoverStrategy(Strategy):
-    def __init__(self, data, events, short_window=40, long_window=100):
+    """
+    Goes LONG when the short simple moving average of the close
+    crosses above the long one and EXITs when it crosses back below.
+
+    Both averages are streaming SMA indicators fed once per new bar,
+    so each MarketEvent costs O(1) per symbol instead of rebuilding
+    a DataFrame of the last long_window bars. They are taken from an
+    IndicatorRegistry, which strategies run side by side can share.
+    """
+
+    def __init__(self, data, events, short_window=40, long_window=100, indicators=None):
+        """
+        Parameters:
+        data - The DataHandler object providing the bars.
+        events - The Event Queue object.
+        short_window - The period of the short moving average.
+        long_window - The period of the long moving average.
+        indicators - An IndicatorRegistry shared with other strategies,
+                     by default a private one.
+        """
+        super().__init__()
         self.data = data
         self.symbol_list = self.data.symbol_list
         self.events = events
@@ -16,6 +37,17 @@ class MovingAverageCrossoverStrategy(Strategy):
         self.long_window = long_window
         self.bought = self._calculate_initial_bought()
 
+        self.indicators = indicators if indicators is not None else IndicatorRegistry(data)
+        # The short average never looks further back than long_window bars
+        self.short_mavg = {
+            s: self.acquire_indicator(s, 'SMA', min(short_window, long_window), 'close')
+            for s in self.symbol_list
+        }
+        self.long_mavg = {
+            s: self.acquire_indicator(s, 'SMA', long_window, 'close') for s in self.symbol_list
+        }
+        self.latest_datetime = {s: None for s in self.symbol_list}
+
     def _calculate_initial_bought(self):
         bought = {}
         for symbol in self.symbol_list:
@@ -24,28 +56,46 @@ class MovingAverageCrossoverStrategy(Strategy):
 
     def calculate_signals(self, event):
         if event.type == 'MARKET':
+            self.indicators.refresh()
+            latest_datetime = self.indicators.latest_datetime
             for symbol in self.symbol_list:
-                bars = self.data.get_latest_bars(symbol, N=self.long_window)
+                bar_date = latest_datetime.get(symbol)
 
-                if bars is not None and len(bars) >= self.long_window:
-                    df = pd.DataFrame(bars, columns=['Symbol', 'Date', 'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume', 'Industry', 'Sector'])
-                    df.set_index('Date', inplace=True)
+                # Only act once per new bar
+                if bar_date is None or bar_date == self.latest_datetime[symbol]:
+                    continue
+                self.latest_datetime[symbol] = bar_date
 
-                    # print('2 row>>>>>>>',df.head(2))
-
-                    short_mavg = df['Close'].rolling(window=self.short_window, min_periods=1).mean()
-                    long_mavg = df['Close'].rolling(window=self.long_window, min_periods=1).mean()
+                short_mavg = self.short_mavg[symbol].value
+                long_mavg = self.long_mavg[symbol].value
 
+                if self.long_mavg[symbol].ready:
                     symbol_bought = self.bought[symbol]
-                    if short_mavg.iloc[-1] > long_mavg.iloc[-1] and symbol_bought == 'OUT':
-                        signal = SignalEvent(symbol, df.index[-1], 'LONG', 10)
+                    if short_mavg > long_mavg and symbol_bought == 'OUT':
+                        signal = SignalEvent(symbol, bar_date, 'LONG', 10)
                         self.events.put(signal)
                         self.bought[symbol] = 'LONG'
-                    elif short_mavg.iloc[-1] < long_mavg.iloc[-1] and symbol_bought == 'LONG':
-                        signal = SignalEvent(symbol, df.index[-1], 'EXIT', 10)
+                    elif short_mavg < long_mavg and symbol_bought == 'LONG':
+                        signal = SignalEvent(symbol, bar_date, 'EXIT', 10)
                         self.events.put(signal)
                         self.bought[symbol] = 'OUT'
 
+    def calculate_signals_vectorized(self, bars):
+        """
+        Computes the crossover signals for a whole symbol history at
+        once: the position state is 1 while the short average is above
+        the long one and 0 while it is below (ties and the warm-up
+        period keep the previous state); LONG and EXIT are its changes.
+        """
+        close = pd.Series(bars['close'])
+        short_mavg = close.rolling(window=min(self.short_window, self.long_window)).mean().to_numpy()
+        long_mavg = close.rolling(window=self.long_window).mean().to_numpy()
+
+        state = np.where(short_mavg > long_mavg, 1.0, np.where(short_mavg < long_mavg, 0.0, np.nan))
+        state = pd.Series(state).ffill().fillna(0.0).to_numpy()
+        change = np.diff(state, prepend=0.0)
+        return np.where(change > 0, 'LONG', np.where(change < 0, 'EXIT', ''))
+
 # Example usage:
 # data = YourDataHandlerClass(...)
 # events = YourEventQueueClass(...)
@@ -5,6 +5,7 @@ import queue
 
 from abc import ABCMeta, abstractmethod
 
+from bars import MatrixRingBuffer
 from event import SignalEvent
 
 class Strategy(object):
@@ -23,6 +24,10 @@ class Strategy(object):
 
     __metaclass__ = ABCMeta
 
+    def __init__(self):
+        # Indicators acquired from self.indicators, see acquire_indicator()
+        self.acquired_indicators = []
+
     @abstractmethod
     def calculate_signals(self):
         """
@@ -30,6 +35,38 @@ class Strategy(object):
         """
         raise NotImplementedError("Should implement calculate_signals()")
 
+    def calculate_signals_vectorized(self, bars):
+        """
+        Optionally computes the signals for the whole history of a
+        single symbol in one pass, for use by the VectorizedBacktest.
+        Only strategies whose signals depend solely on past bars of
+        that symbol can implement this.
+
+        Parameters:
+        bars - Dictionary of field name -> NumPy array of the symbol's bars.
+
+        Returns a NumPy string array with one entry per bar:
+        'LONG', 'SHORT', 'EXIT' or '' for no signal.
+        """
+        raise NotImplementedError("Should implement calculate_signals_vectorized()")
+
+    def acquire_indicator(self, symbol, name, *params):
+        """
+        Acquires a shared indicator from self.indicators (an
+        IndicatorRegistry), remembering it for release_indicators().
+        """
+        self.acquired_indicators.append((symbol, name) + params)
+        return self.indicators.acquire(symbol, name, *params)
+
+    def release_indicators(self):
+        """
+        Releases every indicator the strategy acquired, so that the
+        registry can evict those no other strategy uses.
+        """
+        for acquired in self.acquired_indicators:
+            self.indicators.release(*acquired)
+        self.acquired_indicators = []
+
 class BuyAndHoldStrategy(Strategy):
     """
     This is an extremely simple strategy that goes LONG all of the 
@@ -47,6 +84,7 @@ class BuyAndHoldStrategy(Strategy):
         bars - The DataHandler object that provides bar information
         events - The Event Queue object.
         """
+        super().__init__()
         self.bars = bars
         self.symbol_list = self.bars.symbol_list
         self.events = events
@@ -82,4 +120,119 @@ class BuyAndHoldStrategy(Strategy):
                         # (Symbol, Datetime, Type = LONG, SHORT or EXIT)
                         signal = SignalEvent(bars[0][0], bars[0][1], 'LONG')
                         self.events.put(signal)
-                        self.bought[s] = True
\ No newline at end of file
+                        self.bought[s] = True
+
+
+def cross_sectional_rank(values):
+    """
+    Ranks a vector of values across symbols, returning ranks scaled to
+    [0, 1] (0 for the lowest value, ties in symbol order), NaN where
+    the value is NaN.
+    """
+    ranks = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    if count:
+        order = np.empty(count)
+        order[values[valid].argsort(kind='stable')] = np.arange(count)
+        ranks[valid] = order / max(count - 1, 1)
+    return ranks
+
+
+def cross_sectional_zscore(values):
+    """
+    Standardises a vector of values across symbols to zero mean and
+    unit standard deviation, ignoring NaNs; all zero if they do not vary.
+    """
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return np.full(len(values), np.nan)
+    std = np.nanstd(values)
+    if std == 0:
+        return np.where(valid, 0.0, np.nan)
+    return (values - np.nanmean(values)) / std
+
+
+class CrossSectionalStrategy(Strategy):
+    """
+    CrossSectionalStrategy is a base class for strategies that decide
+    over the whole universe at once (ranking, momentum, pairs) rather
+    than looping over the symbols one at a time.
+
+    On every MarketEvent the latest value of each of its fields for
+    every symbol, taken from the data handler's cross-sections, is
+    appended to a time x symbol MatrixRingBuffer of window rows. These
+    matrices are passed to calculate_cross_section(), which computes
+    the signals with array operations (see cross_sectional_rank() and
+    cross_sectional_zscore()) and emits them with put_signals().
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self, data, events, fields=('close',), window=1):
+        """
+        Parameters:
+        data - The DataHandler object providing get_cross_section().
+        events - The Event Queue object.
+        fields - The bar fields kept for the universe.
+        window - The number of bars kept per field.
+        """
+        super().__init__()
+        self.data = data
+        self.events = events
+        self.symbol_list = self.data.symbol_list
+        self.symbols = np.array(self.symbol_list, dtype=object)
+        self.fields = list(fields)
+        self.window = window
+
+        self.bars = {f: MatrixRingBuffer(len(self.symbol_list), window) for f in self.fields}
+        # True for the symbols updated by the current bar
+        self.updated = np.zeros(len(self.symbol_list), dtype=bool)
+        self._sections = None
+
+    def calculate_signals(self, event):
+        if event.type == 'MARKET':
+            if self._sections is None:
+                self._sections = {f: self.data.get_cross_section(f) for f in self.fields}
+            for f, buffer in self.bars.items():
+                buffer.append(self._sections[f])
+
+            updated = self.data.updated_symbols
+            if len(updated) == len(self.symbol_list):
+                self.updated[:] = True
+            else:
+                self.updated[:] = False
+                index = self.data.symbol_index
+                for s in updated:
+                    self.updated[index[s]] = True
+
+            self.calculate_cross_section({f: buffer.values() for f, buffer in self.bars.items()})
+
+    @abstractmethod
+    def calculate_cross_section(self, bars):
+        """
+        Computes the signals of the current bar for the whole universe.
+
+        Parameters:
+        bars - Dictionary of field name -> (time x symbol) NumPy array of
+               the last window bars, oldest first, with the columns in
+               symbol_list order and NaN before a symbol's first bar.
+        """
+        raise NotImplementedError("Should implement calculate_cross_section()")
+
+    def put_signals(self, selected, signal_type, quantity=1):
+        """
+        Puts a SignalEvent of signal_type for every selected symbol and
+        returns their number.
+
+        Parameters:
+        selected - Boolean mask over, or integer indices into, symbol_list.
+        signal_type - 'LONG', 'SHORT' or 'EXIT'.
+        quantity - The quantity of every signal.
+        """
+        symbols = self.symbols[selected]
+        if len(symbols):
+            bar_date = self.data.get_latest_bar_datetime(self.data.updated_symbols[0])
+            for symbol in symbols:
+                self.events.put(SignalEvent(symbol, bar_date, signal_type, quantity))
+        return len(symbols)
@@ -0,0 +1,174 @@
+import inspect
+import itertools
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import Backtest
+from bus import EventBus
+from bars import BarStore
+from data import HistoricArrayDataHandler
+from execution import SimulatedExecutionHandler
+from portfolio import NaivePortfolio
+
+
+class SharedBarStore(object):
+    """
+    SharedBarStore publishes the arrays of a loaded BarStore to
+    multiprocessing.shared_memory blocks, so that worker processes can
+    map the same bar data read-only instead of re-reading the source.
+
+    Only the small picklable spec (block names, dtypes and lengths)
+    is sent to the workers, which rebuild a BarStore over the shared
+    pages with attach().
+    """
+
+    def __init__(self, bars):
+        """
+        Parameters:
+        bars - The loaded BarStore to publish.
+        """
+        self.fields = list(bars.fields)
+        self._blocks = []
+        self.spec = {}
+        for s in bars.datetimes:
+            arrays = {'datetime': bars.datetimes[s]}
+            arrays.update(bars.columns[s])
+            self.spec[s] = {
+                name: self._publish(array) for name, array in arrays.items()
+            }
+
+    def _publish(self, array):
+        # Shared memory holds fixed-size items only, so object columns
+        # (e.g. industry, sector) are stored as fixed-width strings
+        if array.dtype == object:
+            array = array.astype(str)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[:] = array
+        self._blocks.append(block)
+        return block.name, array.dtype.str, len(array)
+
+    def close(self):
+        """
+        Releases and removes the shared memory blocks.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def attach(fields, spec):
+    """
+    Rebuilds a read-only BarStore over the shared memory blocks
+    described by a SharedBarStore spec. Returns the BarStore and the
+    attached blocks, which must stay referenced while it is in use.
+    """
+    bars = BarStore(fields)
+    blocks = []
+    for s, arrays in spec.items():
+        views = {}
+        for name, (block_name, dtype, length) in arrays.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            view = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+            view.flags.writeable = False
+            views[name] = view
+        bars.add_symbol(s, views.pop('datetime'), views)
+    return bars, blocks
+
+
+def parameter_grid(grid):
+    """
+    Expands a dictionary of parameter name -> list of values into
+    the list of all parameter combinations (as dictionaries).
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def build_strategy(strategy_cls, data, events, portfolio, params):
+    """
+    Instantiates a strategy for a sweep run, passing the portfolio
+    along to strategies that take one (e.g. StopLossStrategy).
+    """
+    if 'portfolio' in inspect.signature(strategy_cls).parameters:
+        params = dict(params, portfolio=portfolio)
+    return strategy_cls(data, events, **params)
+
+
+# Per-process state of the sweep workers, set by _init_worker
+_worker_bars = None
+_worker_blocks = None
+
+
+def _init_worker(fields, spec):
+    global _worker_bars, _worker_blocks
+    _worker_bars, _worker_blocks = attach(fields, spec)
+
+
+def run_single(bars, symbol_list, strategy_cls, params, start_date, initial_capital):
+    """
+    Runs one event-driven backtest over a BarStore and returns the
+    stats tuples of output_summary_stats (equity.csv is not written).
+    """
+    events = EventBus()
+    data = HistoricArrayDataHandler(events, bars, symbol_list)
+    portfolio = NaivePortfolio(data, events, start_date, symbol_list, initial_capital)
+    strategy = build_strategy(strategy_cls, data, events, portfolio, params)
+    broker = SimulatedExecutionHandler(events)
+    Backtest(data, strategy, portfolio, broker, events).run()
+    return portfolio.output_summary_stats(filename=None)
+
+
+def _run_worker(args):
+    return run_single(_worker_bars, *args)
+
+
+def run_sweep(bars, symbol_list, strategy_cls, grid, start_date,
+              initial_capital=100000.0, max_workers=None):
+    """
+    Runs a backtest of strategy_cls for every combination of the
+    parameter grid, fanned out across a process pool. The bar data is
+    loaded once by the caller and shared with the workers through
+    shared memory.
+
+    Returns a DataFrame with one row per combination: the parameters
+    followed by the statistics of output_summary_stats.
+
+    Parameters:
+    bars - The BarStore of a loaded HistoricDataHandler (data.bars).
+    symbol_list - A list of symbol strings.
+    strategy_cls - The Strategy class, e.g. MovingAverageCrossoverStrategy.
+    grid - Dictionary of parameter name -> list of values,
+           e.g. {'short_window': [20, 40], 'long_window': [100, 200]}.
+    start_date - The start date (bar) of the portfolios.
+    initial_capital - The starting capital in USD.
+    max_workers - Number of worker processes, defaults to the CPU count.
+    """
+    combinations = parameter_grid(grid)
+    shared = SharedBarStore(bars)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared.fields, shared.spec)
+        ) as pool:
+            tasks = [
+                (symbol_list, strategy_cls, params, start_date, initial_capital)
+                for params in combinations
+            ]
+            results = list(pool.map(_run_worker, tasks))
+    finally:
+        shared.close()
+
+    rows = []
+    for params, stats in zip(combinations, results):
+        row = dict(params)
+        row.update({name: float(value) for name, value in stats})
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,49 @@
+import datetime
+
+import numpy as np
+
+from bus import EventBus
+from data import HistoricMySQLDataHandler
+from benchmarks.fakemysql import FakeMySQL
+from benchmarks.synthetic import MINUTE
+
+
+def _bars(handler, symbol):
+    bars = []
+    while handler.continue_backtest:
+        handler.update_bars()
+        if handler.continue_backtest and symbol in handler.updated_symbols:
+            bars.append(handler.get_latest_bars(symbol)[0][1:])
+    return bars
+
+
+def test_streamed_chunks_keep_the_dtypes_of_the_first():
+    fake = FakeMySQL(['AAA'], 30)
+    table = fake.tables['AAA']
+    # NULLs only after the first chunk, in an integer and a float column
+    table['volume'][12] = None
+    table['close'][21] = None
+
+    loaded = HistoricMySQLDataHandler(EventBus(), {}, ['AAA'], connector=fake)
+    streamed = HistoricMySQLDataHandler(EventBus(), {}, ['AAA'], chunk_size=5, connector=fake)
+    expected, bars = _bars(loaded, 'AAA'), _bars(streamed, 'AAA')
+
+    assert len(bars) == len(expected) == 30
+    fields = HistoricMySQLDataHandler.fields
+    volume, close = 1 + fields.index('volume'), 1 + fields.index('close')
+    assert np.isnan(bars[12][volume]) and np.isnan(bars[21][close])
+    for bar, row in zip(bars, expected):
+        assert bar[0] == row[0]
+        for i in range(1, len(fields) + 1):
+            assert bar[i] == row[i] or (np.isnan(bar[i]) and np.isnan(row[i]))
+
+
+def test_streamed_datetimes_keep_their_time_of_day():
+    fake = FakeMySQL(['AAA'], 30, MINUTE)
+    table = fake.tables['AAA']
+    # A DATETIME column whose first chunk is all at midnight
+    for i in range(7):
+        table['Date'][i] = datetime.datetime(1999, 12, 20 + i)
+    streamed = HistoricMySQLDataHandler(EventBus(), {}, ['AAA'], chunk_size=7, connector=fake)
+    bars = _bars(streamed, 'AAA')
+    assert [bar[0] for bar in bars] == table['Date']
@@ -0,0 +1,63 @@
+from bus import EventBus
+from data import HistoricCSVDataHandler
+from event import OrderEvent, SignalEvent
+from execution import OrderBookExecutionHandler
+from portfolio import NaivePortfolio
+from benchmarks.synthetic import symbol_names, write_csv_dir
+
+
+def _order_book_run(tmp_path):
+    symbols = symbol_names(1)
+    write_csv_dir(str(tmp_path), symbols, 20, 'daily', 0)
+    events = EventBus()
+    data = HistoricCSVDataHandler(events, str(tmp_path), symbols)
+    portfolio = NaivePortfolio(data, events, None, symbols)
+    broker = OrderBookExecutionHandler(events, data)
+    orders, cancels = [], []
+    events.subscribe('MARKET', broker.update_timeindex)
+    events.subscribe('SIGNAL', portfolio.update_signal)
+    events.subscribe('ORDER', orders.append)
+    events.subscribe('ORDER', broker.execute_order)
+    events.subscribe('FILL', portfolio.update_fill)
+    events.subscribe('CANCEL', cancels.append)
+    events.subscribe('CANCEL', portfolio.update_cancel)
+    data.update_bars()
+    events.dispatch()
+    return symbols[0], data, events, portfolio, broker, orders, cancels
+
+
+def test_self_trade_prevention_reports_cancelled_orders(tmp_path):
+    symbol, data, events, portfolio, broker, orders, cancels = _order_book_run(tmp_path)
+    price = data.get_latest_bar_value(symbol, broker.price_field)
+
+    # A sell limit the portfolio has working far above the market
+    events.put(OrderEvent(symbol, 'LMT', 100, 'SELL', price * 2))
+    portfolio.working_quantity[symbol] -= 100
+    events.dispatch()
+    assert broker.book(symbol).best_ask() == price * 2
+
+    # Closing it with a market buy would trade with the resting sell
+    events.put(SignalEvent(symbol, data.current_datetime, 'EXIT', 1))
+    events.dispatch()
+    assert [(c.quantity, c.direction) for c in cancels] == [(100, 'SELL')]
+    assert len(broker.book(symbol)) == 0
+    assert portfolio.current_positions[symbol] == 100
+    assert portfolio.working_quantity[symbol] == 0
+
+    # The next signal is sized without the cancelled quantity
+    events.put(SignalEvent(symbol, data.current_datetime, 'EXIT', 1))
+    events.dispatch()
+    assert (orders[-1].quantity, orders[-1].direction) == (100, 'SELL')
+    assert portfolio.current_positions[symbol] == 0
+
+
+def test_cancel_order_is_reported(tmp_path):
+    symbol, data, events, portfolio, broker, orders, cancels = _order_book_run(tmp_path)
+    price = data.get_latest_bar_value(symbol, broker.price_field)
+
+    order = OrderEvent(symbol, 'LMT', 50, 'BUY', price / 2)
+    events.put(order)
+    events.put(OrderEvent(symbol, 'CXL', 0, 'BUY', order_id=order.sequence))
+    events.dispatch()
+    assert [(c.quantity, c.direction, c.order_id) for c in cancels] == [(50, 'BUY', order.sequence)]
+    assert len(broker.book(symbol)) == 0
@@ -0,0 +1,40 @@
+import numpy as np
+
+from ledger import BUY, SELL, TradeLedger
+
+
+def test_round_trips_split_a_reversing_fill():
+    ledger = TradeLedger(['AAA', 'BBB'])
+    day = np.datetime64('2020-01-01')
+    ledger.record(day, 'AAA', BUY, 10, 100.0, 1.0)
+    ledger.record(day, 'BBB', SELL, 5, 50.0, 1.0)
+    # Long 10 to short 15 in one fill
+    ledger.record(day + 1, 'AAA', SELL, 25, 110.0, 1.0)
+    ledger.record(day + 2, 'BBB', BUY, 5, 40.0, 1.0)
+    ledger.record(day + 3, 'AAA', BUY, 15, 105.0, 1.0)
+
+    trips = ledger.round_trips()
+    aaa = trips[trips['symbol'] == 'AAA'].reset_index(drop=True)
+    assert list(aaa['direction']) == [1, -1]
+    assert list(aaa['entry_price']) == [100.0, 110.0]
+    assert list(aaa['exit_price']) == [110.0, 105.0]
+    assert list(aaa['quantity']) == [10, 15]
+    # The reversing fill's commission is shared 10:15 between the trips
+    assert np.allclose(aaa['commission'], [1.4, 1.6])
+    assert np.allclose(aaa['pnl'], [100.0 - 1.4, 75.0 - 1.6])
+    assert list(aaa['entry_time']) == [day, day + 1]
+
+    bbb = trips[trips['symbol'] == 'BBB']
+    assert len(bbb) == 1 and np.isclose(bbb['pnl'].iloc[0], 50.0 - 2.0)
+    assert ledger.summary()['Trades'] == 3
+
+
+def test_round_trips_leave_out_the_open_part_of_a_reversal():
+    ledger = TradeLedger(['AAA'])
+    day = np.datetime64('2020-01-01')
+    ledger.record(day, 'AAA', SELL, 10, 100.0, 0.0)
+    ledger.record(day + 1, 'AAA', BUY, 30, 90.0, 0.0)
+
+    trips = ledger.round_trips()
+    assert len(trips) == 1
+    assert trips['direction'].iloc[0] == -1 and np.isclose(trips['pnl'].iloc[0], 100.0)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from profiler import LoopProfiler
+
+
+def test_latencies_use_fixed_memory_and_close_percentiles():
+    latencies = np.random.default_rng(0).lognormal(np.log(20e-6), 1.0, 100000)
+    times = iter(np.column_stack([np.zeros(len(latencies)), latencies]).ravel())
+    profiler = LoopProfiler(clock=lambda: next(times))
+    timed = profiler.wrap('strategy', lambda event: None, 'MARKET')
+    for _ in range(len(latencies)):
+        timed(None)
+
+    stats = profiler.latencies[('strategy', '<lambda>', 'MARKET')]
+    assert len(stats.buffer) < stats.size
+
+    record = profiler.records()[0]
+    assert record['calls'] == len(latencies)
+    assert np.isclose(record['total_s'], latencies.sum())
+    assert np.isclose(record['max_us'], latencies.max() * 1e6)
+    exact = np.percentile(latencies, [50, 90, 99]) * 1e6
+    approx = [record['p50_us'], record['p90_us'], record['p99_us']]
+    assert np.allclose(approx, exact, rtol=0.02)
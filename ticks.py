@@ -0,0 +1,287 @@
+import os, os.path
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from align import FORWARD_FILL
+from bars import RingBuffer
+from data import HistoricDataHandler
+
+
+class _TickSymbolStream(object):
+    """
+    Reads the tick file of one symbol in chunks and aggregates the
+    ticks into OHLCV bars at every requested resolution.
+
+    Each chunk is aggregated with vectorized reductions over its time
+    buckets. The last bucket of a chunk may continue in the next one,
+    so it is carried over as a partial bar and only released once a
+    later tick (or the end of the file) shows it is complete. At most
+    one chunk of ticks is held at a time.
+    """
+
+    def __init__(self, path, columns, resolutions, chunk_size):
+        """
+        Parameters:
+        path - The tick file, in time order.
+        columns - The (datetime, price, volume) column names of the file.
+        resolutions - Bar lengths in nanoseconds.
+        chunk_size - Number of ticks read at a time.
+        """
+        self.columns = list(columns)
+        self.resolutions = resolutions
+        self.reader = pd.read_csv(path, usecols=self.columns, chunksize=chunk_size)
+        self.carry = [None] * len(resolutions)
+        self.queues = [deque() for _ in resolutions]
+        self.exhausted = False
+
+    def _read(self):
+        """
+        Aggregates the next chunk of ticks, or completes the partial
+        bars at the end of the file.
+        """
+        try:
+            ticks = next(self.reader)
+        except StopIteration:
+            self.exhausted = True
+            for i, partial in enumerate(self.carry):
+                if partial is not None:
+                    self.queues[i].append(self._bar(i, partial))
+                self.carry[i] = None
+            return
+
+        dt, price, volume = self.columns
+        timestamps = pd.to_datetime(ticks[dt]).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        prices = ticks[price].to_numpy(dtype=np.float64)
+        volumes = ticks[volume].to_numpy(dtype=np.float64)
+        if len(timestamps):
+            for i in range(len(self.resolutions)):
+                self._aggregate(i, timestamps, prices, volumes)
+
+    def _aggregate(self, i, timestamps, prices, volumes):
+        buckets = timestamps // self.resolutions[i]
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)] - 1
+        bars = list(zip(
+            buckets[starts].tolist(),
+            prices[starts].tolist(),
+            np.maximum.reduceat(prices, starts).tolist(),
+            np.minimum.reduceat(prices, starts).tolist(),
+            prices[ends].tolist(),
+            np.add.reduceat(volumes, starts).tolist(),
+        ))
+
+        partial = self.carry[i]
+        if partial is not None:
+            if partial[0] == bars[0][0]:
+                # The chunk continues the carried bar
+                first = bars[0]
+                bars[0] = (partial[0], partial[1], max(partial[2], first[2]),
+                           min(partial[3], first[3]), first[4], partial[5] + first[5])
+            else:
+                self.queues[i].append(self._bar(i, partial))
+
+        queue = self.queues[i]
+        for bar in bars[:-1]:
+            queue.append(self._bar(i, bar))
+        self.carry[i] = bars[-1]
+
+    def _bar(self, i, bar):
+        # (bucket, o, h, l, c, v) -> (start datetime, o, h, l, c, v)
+        start = np.datetime64(bar[0] * self.resolutions[i], 'ns').astype('datetime64[us]')
+        return (start,) + tuple(bar[1:])
+
+    def peek(self, i):
+        """
+        Returns the next complete bar at resolution i, or None.
+        """
+        queue = self.queues[i]
+        while not queue:
+            if self.exhausted:
+                return None
+            self._read()
+        return queue[0]
+
+    def pop(self, i):
+        if self.peek(i) is None:
+            return None
+        return self.queues[i].popleft()
+
+    def release(self, i, until):
+        """
+        Removes and returns the complete bars at resolution i ending
+        at or before until (a datetime64).
+        """
+        length = np.timedelta64(self.resolutions[i], 'ns')
+        queue = self.queues[i]
+        bars = []
+        while True:
+            if queue:
+                if queue[0][0] + length > until:
+                    break
+                bars.append(queue.popleft())
+                continue
+            # The partial bar may be complete; only a later tick can tell
+            partial = self.carry[i]
+            if self.exhausted or partial is None or \
+                    np.datetime64(partial[0] * self.resolutions[i], 'ns') + length > until:
+                break
+            self._read()
+        return bars
+
+
+class TickBarSource(object):
+    """
+    TickBarSource stands in for the BarStore of a HistoricTickDataHandler,
+    offering the per-symbol dtypes(), peek_datetime() and next_bar() of
+    the bars at the primary (first) resolution, backed by one
+    _TickSymbolStream per symbol. Bars at the other resolutions are
+    taken with release().
+    """
+
+    def __init__(self, fields, streams):
+        """
+        Parameters:
+        fields - Ordered list of the bar field names.
+        streams - Dictionary of symbol -> _TickSymbolStream.
+        """
+        self.fields = list(fields)
+        self.streams = streams
+
+    def dtypes(self, symbol):
+        return [('datetime', 'datetime64[us]')] + [(f, np.float64) for f in self.fields]
+
+    def peek_datetime(self, symbol):
+        bar = self.streams[symbol].peek(0)
+        return None if bar is None else bar[0]
+
+    def next_bar(self, symbol):
+        return self.streams[symbol].pop(0)
+
+    def release(self, symbol, i, until):
+        return self.streams[symbol].release(i, until)
+
+
+class HistoricTickDataHandler(HistoricDataHandler):
+    """
+    HistoricTickDataHandler backtests on intraday bars built on the fly
+    from raw ticks (trade prints), without writing bar files first.
+
+    Each symbol's ticks are read from 'symbol.csv' in chunks of
+    chunk_size rows and aggregated incrementally into OHLCV bars, so
+    memory is bounded by the chunk size whatever the size of the files.
+    Bars start on multiples of their resolution and are stamped with
+    their start time; a bar is released once it is complete.
+
+    The first resolution drives the backtest: update_bars() releases its
+    bars and puts MarketEvents exactly as the other historic handlers
+    do, and get_latest_bars() and friends return them. Bars at further
+    resolutions (e.g. '5min' alongside '1min') are released as soon as
+    they have closed by the end of the current bar, and are read by
+    passing resolution= to the getters.
+    """
+
+    fields = ['open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, events, tick_dir, symbol_list, resolutions=('1min',),
+                 chunk_size=100000, lookback=1, align=FORWARD_FILL,
+                 columns=('datetime', 'price', 'volume')):
+        """
+        Parameters:
+        events - The EventBus.
+        tick_dir - Directory holding one 'symbol.csv' tick file per symbol,
+                   each in time order.
+        symbol_list - A list of symbol strings.
+        resolutions - Bar lengths as pandas offsets, e.g. ('1min', '5min');
+                      the first one drives the backtest.
+        chunk_size - Number of ticks read at a time per symbol.
+        lookback - Initial number of bars kept per symbol and resolution.
+        align - FORWARD_FILL or UPDATED_ONLY, see HistoricDataHandler.
+        columns - The (datetime, price, volume) column names of the files.
+        """
+        self.events = events
+        self.tick_dir = tick_dir
+        self.symbol_list = symbol_list
+        self.resolutions = list(resolutions)
+        self.chunk_size = chunk_size
+        self.lookback = lookback
+        self.align = align
+        self.continue_backtest = True
+
+        self._lengths = [pd.Timedelta(r).value for r in self.resolutions]
+        self._primary_length = np.timedelta64(self._lengths[0], 'ns')
+        self.bars = TickBarSource(self.fields, {
+            s: _TickSymbolStream(
+                os.path.join(tick_dir, '%s.csv' % s), columns, self._lengths, chunk_size
+            )
+            for s in symbol_list
+        })
+        self._init_universe()
+
+        # Lookback of the further resolutions, keyed on resolution then symbol
+        self.resolution_data = {
+            r: {s: RingBuffer(self.bars.dtypes(s), lookback) for s in symbol_list}
+            for r in self.resolutions[1:]
+        }
+
+    def _ring(self, symbol, resolution):
+        if resolution is None or resolution == self.resolutions[0]:
+            return self.latest_symbol_data[symbol]
+        return self.resolution_data[resolution][symbol]
+
+    def require_lookback(self, N):
+        lookback = self.lookback
+        super().require_lookback(N)
+        if N > lookback:
+            for rings in self.resolution_data.values():
+                for ring in rings.values():
+                    ring.resize(N)
+
+    def get_latest_bars(self, symbol, N=1, resolution=None):
+        """
+        Returns the last N bars at the resolution (the primary one by
+        default) as a list of tuples (symbol, datetime, open, high, low,
+        close, volume), or N-k if less available.
+        """
+        try:
+            return self._ring(symbol, resolution).tuples(symbol, N)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def get_latest_bars_values(self, symbol, val_type, N=1, resolution=None):
+        """
+        Returns a zero-copy NumPy view of the last N values of val_type
+        at the resolution, or N-k if less available.
+        """
+        try:
+            return self._ring(symbol, resolution).values(val_type, N)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def get_latest_bar_value(self, symbol, val_type, resolution=None):
+        """
+        Returns the latest value of val_type for the symbol at the resolution.
+        """
+        try:
+            return self._ring(symbol, resolution).last(val_type)
+        except KeyError:
+            print("That symbol is not available in the historical data set.")
+
+    def update_bars(self):
+        """
+        Releases the primary bars of the next timestamp, then every bar
+        of the further resolutions that has closed by the end of them.
+        """
+        HistoricDataHandler.update_bars(self)
+        if not self.continue_backtest or not self.resolution_data:
+            return
+
+        symbol = self.updated_symbols[0]
+        until = self.latest_symbol_data[symbol].values('datetime')[-1] + self._primary_length
+        for i, resolution in enumerate(self.resolutions[1:], 1):
+            rings = self.resolution_data[resolution]
+            for s in self.symbol_list:
+                for bar in self.bars.release(s, i, until):
+                    rings[s].append(bar)
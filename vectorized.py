@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+from align import FORWARD_FILL
+from backtest import Backtest
+from bus import EventBus
+from event import FillEvent
+from execution import SimulatedExecutionHandler
+from portfolio import NaivePortfolio, create_equity_curve_frame
+
+
+def simulated_commission(quantity):
+    """
+    Commission of a fill of the given quantity as charged by the
+    SimulatedExecutionHandler, i.e. that of the FillEvent it emits.
+    """
+    return FillEvent(None, None, "EXCHANGE", quantity, None, None).commission
+
+
+class VectorizedBacktest(object):
+    """
+    VectorizedBacktest is a fast-path alternative to the event-driven
+    Backtest for strategies whose signals depend only on past bars of
+    the same symbol (see Strategy.calculate_signals_vectorized).
+
+    Signals, positions and holdings are computed for the whole history
+    of every symbol in one pass over the columnar BarStore. Orders are
+    sized with NaivePortfolio.naive_order_size, which is only evaluated
+    at the (sparse) bars carrying a signal, and fills are priced at
+    the bar of the signal exactly as the NaivePortfolio does. The result
+    is the same DataFrame as NaivePortfolio.create_equity_curve, row for
+    row, over the same universe timeline and alignment mode as the
+    HistoricDataHandler.
+    """
+
+    def __init__(self, bars, symbol_list, strategy, start_date,
+                 initial_capital=100000.0, commission=simulated_commission,
+                 align=FORWARD_FILL):
+        """
+        Parameters:
+        bars - The BarStore of a freshly loaded HistoricDataHandler.
+        symbol_list - A list of symbol strings.
+        strategy - Strategy implementing calculate_signals_vectorized().
+        start_date - The start date (bar) of the portfolio.
+        initial_capital - The starting capital in USD.
+        commission - Callable returning the commission of a fill quantity.
+        align - FORWARD_FILL or UPDATED_ONLY, as in the HistoricDataHandler.
+        """
+        self.bars = bars
+        self.symbol_list = symbol_list
+        self.strategy = strategy
+        self.start_date = start_date
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.align = align
+
+        # NaivePortfolio prices fills and holdings from slot 3 of the
+        # bar tuple (symbol, datetime, field_0, field_1, ...)
+        self.price_field = bars.fields[1]
+
+    def _fills(self, signals):
+        """
+        Applies the naive sizing rule to the bars carrying a signal.
+        Returns the signed quantity filled at every bar.
+        """
+        quantity = np.zeros(len(signals), dtype=np.int64)
+        position = 0
+        for i in np.flatnonzero(signals != ''):
+            size = NaivePortfolio.naive_order_size(signals[i], position)
+            if size is not None:
+                fill_quantity, direction = size
+                quantity[i] = fill_quantity if direction == 'BUY' else -fill_quantity
+                position += quantity[i]
+        return quantity
+
+    def run(self):
+        """
+        Runs the backtest and returns the equity curve DataFrame,
+        also stored in self.equity_curve. Positions per bar (before that
+        bar's fills) are kept in self.positions.
+        """
+        # The universe timeline is the union of all symbols' bar times
+        timeline = np.unique(np.concatenate(
+            [self.bars.datetimes[s] for s in self.symbol_list]
+        ))
+        steps = len(timeline)
+
+        cash_flow = np.zeros(steps)
+        commission_flow = np.zeros(steps)
+        holdings = {}
+        positions = {}
+
+        for s in self.symbol_list:
+            columns = self.bars.columns[s]
+            dates = self.bars.datetimes[s]
+
+            # Index of the bar in effect at every step, -1 before the first
+            current = np.searchsorted(dates, timeline, side='right') - 1
+            started = current >= 0
+            if self.align == FORWARD_FILL:
+                # The strategy sees a (repeated) bar at every step once started
+                seen_steps = np.flatnonzero(started)
+                seen_bars = current[seen_steps]
+            else:
+                seen_steps = np.searchsorted(timeline, dates)
+                seen_bars = np.arange(len(dates))
+
+            signals = self.strategy.calculate_signals_vectorized(
+                {f: columns[f][seen_bars] for f in self.bars.fields}
+            )
+            quantity = np.zeros(steps, dtype=np.int64)
+            quantity[seen_steps] = self._fills(signals)
+
+            price = columns[self.price_field][np.maximum(current, 0)]
+            traded = np.flatnonzero(quantity)
+            commission = np.zeros(steps)
+            commission[traded] = [self.commission(abs(q)) for q in quantity[traded]]
+
+            cash_flow += quantity * price + commission
+            commission_flow += commission
+
+            # Holdings are recorded before the fills of the same bar
+            position = np.cumsum(quantity) - quantity
+            positions[s] = position
+            holdings[s] = np.where(started, position * price, 0.0)
+
+        cash = self.initial_capital - (np.cumsum(cash_flow) - cash_flow)
+        total = cash.copy()
+        for s in self.symbol_list:
+            total += holdings[s]
+
+        datetimes = timeline.tolist()
+        self.positions = pd.DataFrame(positions, index=datetimes)
+
+        matrix = np.column_stack(
+            [holdings[s] for s in self.symbol_list]
+            + [cash, np.cumsum(commission_flow) - commission_flow, total]
+        )
+        initial = [0.0] * len(self.symbol_list) + [self.initial_capital, 0.0, self.initial_capital]
+        self.equity_curve = create_equity_curve_frame(
+            [self.start_date] + datetimes, np.vstack([initial, matrix]), self.symbol_list
+        )
+        return self.equity_curve
+
+
+def check_consistency(make_data, make_strategy, start_date, initial_capital=100000.0, rtol=1e-9):
+    """
+    Runs the same strategy through the event-driven Backtest and the
+    VectorizedBacktest and asserts that the equity curves agree.
+    Returns the (event_driven, vectorized) equity curves.
+
+    Parameters:
+    make_data - Callable taking an EventBus and returning a freshly
+                loaded HistoricDataHandler. It is called once per engine.
+    make_strategy - Callable taking (data, events) and returning the Strategy.
+    start_date - The start date (bar) of the portfolio.
+    initial_capital - The starting capital in USD.
+    rtol - Relative tolerance of the comparison; the engines sum cash
+           flows in a different order.
+    """
+    events = EventBus()
+    data = make_data(events)
+    portfolio = NaivePortfolio(data, events, start_date, data.symbol_list, initial_capital)
+    strategy = make_strategy(data, events)
+    broker = SimulatedExecutionHandler(events)
+    Backtest(data, strategy, portfolio, broker, events).run()
+    event_curve = portfolio.create_equity_curve()
+
+    data = make_data(EventBus())
+    vectorized_curve = VectorizedBacktest(
+        data.bars, data.symbol_list, make_strategy(data, EventBus()),
+        start_date, initial_capital, align=data.align
+    ).run()
+
+    pd.testing.assert_frame_equal(
+        event_curve, vectorized_curve, check_exact=False, rtol=rtol, check_dtype=False
+    )
+    return event_curve, vectorized_curve